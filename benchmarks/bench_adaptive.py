@@ -0,0 +1,116 @@
+"""Benchmark: fixed LocalCluster vs adaptive scaling under a bursty workload.
+
+The workload alternates bursts of short CPU-bound tasks (each holding a few MB
+while it runs) with idle gaps. For each mode it reports task throughput over the
+busy periods, the wall time of the whole run, and the peak and average RSS summed
+over this process and all worker processes.
+
+Run from the project root::
+
+    uv run python -m benchmarks.bench_adaptive
+"""
+
+import argparse
+import contextlib
+import threading
+import time
+
+import psutil
+from dask.distributed import Client, LocalCluster, wait
+
+from src.utils.dask_adaptive import AppAdaptive, adaptive_options
+
+
+def burst_task(i, work_ms, alloc_mb):
+    buffer = bytearray(alloc_mb * 1024 * 1024)
+    deadline = time.perf_counter() + work_ms / 1000
+    x = 0
+    while time.perf_counter() < deadline:
+        x += 1
+    return len(buffer) + i % 2
+
+
+class RssSampler:
+    """Sample the RSS of this process and its children in a background thread"""
+
+    def __init__(self, interval=0.05):
+        self._interval = interval
+        self._stop = threading.Event()
+        self._process = psutil.Process()
+        self.peak = 0
+        self.total = 0
+        self.samples = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _rss(self):
+        rss = self._process.memory_info().rss
+        for child in self._process.children(recursive=True):
+            with contextlib.suppress(psutil.NoSuchProcess):
+                rss += child.memory_info().rss
+        return rss
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            rss = self._rss()
+            self.peak = max(self.peak, rss)
+            self.total += rss
+            self.samples += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    @property
+    def average(self):
+        return self.total / self.samples if self.samples else 0
+
+
+def run(name, cluster, args):
+    client = Client(cluster)
+    busy = 0.0
+    done = 0
+    with RssSampler() as rss:
+        start = time.perf_counter()
+        for burst in range(args.bursts):
+            t0 = time.perf_counter()
+            futures = client.map(burst_task, range(args.tasks), work_ms=args.work_ms, alloc_mb=args.alloc_mb, key=[f"burst-{burst}-{i}" for i in range(args.tasks)])
+            wait(futures)
+            busy += time.perf_counter() - t0
+            done += len(futures)
+            del futures
+            time.sleep(args.gap)
+        elapsed = time.perf_counter() - start
+    client.close()
+    cluster.close()
+    print(f"{name:<10} {done / busy:>10.1f} {busy:>8.2f}s {elapsed:>8.2f}s {rss.peak / 2**20:>10.0f} MB {rss.average / 2**20:>10.0f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bursts", type=int, default=4)
+    parser.add_argument("--tasks", type=int, default=200, help="tasks per burst")
+    parser.add_argument("--work-ms", type=float, default=20.0, help="CPU time per task")
+    parser.add_argument("--alloc-mb", type=int, default=8, help="memory held by each running task")
+    parser.add_argument("--gap", type=float, default=4.0, help="idle seconds between bursts")
+    parser.add_argument("--minimum", type=int, default=1)
+    parser.add_argument("--maximum", type=int, default=4)
+    args = parser.parse_args()
+
+    common = {"threads_per_worker": 1, "dashboard_address": None, "silence_logs": True}
+    print(f"{'mode':<10} {'tasks/s':>10} {'busy':>9} {'total':>9} {'peak RSS':>13} {'avg RSS':>13}")
+
+    run(f"fixed-{args.minimum}", LocalCluster(n_workers=args.minimum, **common), args)
+    run(f"fixed-{args.maximum}", LocalCluster(n_workers=args.maximum, **common), args)
+
+    cluster = LocalCluster(n_workers=args.minimum, **common)
+    options = adaptive_options({"minimum": args.minimum, "maximum": args.maximum, "target_duration": "1s", "interval": "250ms", "idle_timeout": f"{args.gap / 2}s"})
+    cluster.adapt(Adaptive=AppAdaptive, **options)
+    run("adaptive", cluster, args)
+
+
+if __name__ == "__main__":
+    main()
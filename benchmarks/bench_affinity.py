@@ -0,0 +1,94 @@
+"""Benchmark: keyed affinity routing vs. unrouted submission for stateful tasks.
+
+Each task belongs to one of ``--sessions`` keys and needs that key's worker-local
+state (``local_state``), which costs ``--build-ms`` to create, e.g. loading a model
+or opening a file. Unrouted tasks land on whichever worker is free and rebuild the
+state on every worker; routed tasks go to the key's worker on the hash ring. The
+benchmark reports throughput and the state hit rate for both, then adds a worker
+and reports how many keys the ring moved compared with the ideal 1/N.
+
+Run from the project root::
+
+    uv run python -m benchmarks.bench_affinity
+"""
+
+import argparse
+import random
+import time
+
+from dask.distributed import Client, LocalCluster
+
+from src.utils.dask_affinity import AffinityRouter, HashRing, clear_local_state, local_state, local_state_stats
+
+
+def build_state(session, build_ms):
+    time.sleep(build_ms / 1000)
+    return {"session": session, "payload": bytes(1024)}
+
+
+def handle(session, build_ms, work_ms):
+    state = local_state(session, lambda: build_state(session, build_ms))
+    time.sleep(work_ms / 1000)
+    return state["session"]
+
+
+def reset_state(dask_worker):
+    clear_local_state(dask_worker)
+
+
+def run(client, name, submit, sessions, args):
+    client.run(reset_state)
+    start = time.perf_counter()
+    futures = [submit(session) for session in sessions]
+    results = client.gather(futures)
+    elapsed = time.perf_counter() - start
+    assert results == sessions
+    stats = local_state_stats(client).values()
+    hits = sum(s["hits"] for s in stats)
+    misses = sum(s["misses"] for s in stats)
+    print(f"{name:<10} {len(sessions) / elapsed:>10.0f} tasks/s   hit rate {hits / (hits + misses):6.1%}   state builds {misses}")
+
+
+def remap_fraction(workers, keys, replicas):
+    ring = HashRing(workers, replicas=replicas)
+    before = {key: ring.get(key) for key in keys}
+    ring.add("tcp://127.0.0.1:new")
+    moved = sum(before[key] != ring.get(key) for key in keys)
+    return moved / len(keys)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=3000)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=2)
+    parser.add_argument("--build-ms", type=float, default=20.0)
+    parser.add_argument("--work-ms", type=float, default=1.0)
+    parser.add_argument("--replicas", type=int, default=100)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    sessions = [f"session-{rng.randrange(args.sessions)}" for _ in range(args.tasks)]
+
+    with LocalCluster(n_workers=args.workers, threads_per_worker=args.threads, dashboard_address=None) as cluster, Client(cluster) as client:
+        router = AffinityRouter(client, replicas=args.replicas)
+        print(f"{args.tasks} tasks over {args.sessions} keys on {args.workers} workers x {args.threads} threads, state build {args.build_ms} ms")
+
+        def unrouted(session):
+            return client.submit(handle, session, args.build_ms, args.work_ms, pure=False)
+
+        def routed(session):
+            return router.submit(session, handle, session, args.build_ms, args.work_ms, pure=False)
+
+        run(client, "unrouted", unrouted, sessions, args)
+        run(client, "routed", routed, sessions, args)
+
+        workers = list(client.scheduler_info(n_workers=-1)["workers"])
+        keys = [f"session-{i}" for i in range(args.sessions * 50)]
+        fraction = remap_fraction(workers, keys, args.replicas)
+        print(f"adding a worker moved {fraction:.1%} of keys (ideal {1 / (len(workers) + 1):.1%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Import-time guard: measure ``import src`` with ``-X importtime`` and fail on regressions.
+
+The check fails (exit code 1) when the cumulative import time exceeds the budget, when
+a heavyweight dependency is imported eagerly, or when a lazy export of ``src.utils``
+resolves to a submodule instead of the object it names (importing ``src.utils.x``
+binds ``x`` on the package and shadows an export of the same name). Run from the
+project root::
+
+    uv run python -m benchmarks.bench_import_time --budget-ms 100
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+# 这些依赖只能在真正用到对应功能时才导入
+LAZY_MODULES = ("dask", "distributed", "pydub", "yaml", "numpy", "click")
+
+
+def measure(module):
+    """Return ({imported module: cumulative microseconds}, wall-clock microseconds of the target)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=os.getcwd(),
+    )
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:") :].split("|")
+        cumulative[name.strip()] = int(cumulative_us)
+    return cumulative, cumulative.get(module, 0)
+
+
+# 先导入所有子模块（它们会把自身绑定到包上），再检查每个导出名取到的不是模块
+EXPORTS_CHECK = """
+import importlib, types
+import src.utils as utils
+for module in set(utils._EXPORTS.values()):
+    importlib.import_module(module, utils.__name__)
+for name in utils.__all__:
+    if isinstance(getattr(utils, name), types.ModuleType):
+        print(name)
+"""
+
+
+def shadowed_exports():
+    """Names in ``src.utils.__all__`` that resolve to a module once every submodule is imported"""
+    result = subprocess.run([sys.executable, "-c", EXPORTS_CHECK], capture_output=True, text=True, check=True, cwd=os.getcwd())
+    return result.stdout.split()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="src")
+    parser.add_argument("--budget-ms", type=float, default=100.0)
+    parser.add_argument("--runs", type=int, default=5, help="the fastest run is reported, to reduce noise")
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.runs)]
+    imported, best_us = min(runs, key=lambda run: run[1])
+
+    print(f"import {args.module}: {best_us / 1000:.1f} ms (best of {args.runs}, budget {args.budget_ms:g} ms)")
+    for name, us in sorted(imported.items(), key=lambda item: item[1], reverse=True)[:10]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    failures = []
+    if best_us / 1000 > args.budget_ms:
+        failures.append(f"import time {best_us / 1000:.1f} ms exceeds the {args.budget_ms:g} ms budget")
+    eager = sorted(name for name in imported if name.split(".")[0] in LAZY_MODULES)
+    if eager:
+        failures.append(f"heavy modules imported eagerly: {', '.join(eager[:10])}")
+    if args.module == "src":
+        shadowed = shadowed_exports()
+        if shadowed:
+            failures.append(f"src.utils exports shadowed by submodules of the same name: {', '.join(shadowed)}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
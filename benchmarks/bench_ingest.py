@@ -0,0 +1,113 @@
+"""Benchmark: ingestion service latency and throughput, micro-batched vs. one Dask task per job.
+
+The service runs in this process on an ephemeral port in front of a local Dask
+cluster (or the thread pool with ``--backend local``). ``--connections`` keep-alive
+clients each send single-job ``POST /jobs`` requests back to back until
+``--requests`` have been sent in total; latency is measured per request from send
+to the last byte of the response. Requests rejected with 429 are counted apart and
+left out of the latency percentiles.
+
+Run from the project root::
+
+    uv run python -m benchmarks.bench_ingest
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from dask.distributed import Client, LocalCluster
+from loguru import logger
+
+from src.utils.ingest import IngestService, dask_submitter, local_submitter
+
+
+async def send(reader, writer, body):
+    writer.write(f"POST /jobs HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while (line := await reader.readline()) != b"\r\n":
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def connection(port, bodies, latencies, statuses):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        while bodies:
+            body = bodies.pop()
+            start = time.perf_counter()
+            status = await send(reader, writer, body)
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == 200:
+                latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+
+async def run_mode(client, args, batch_size, batch_delay):
+    submit = dask_submitter(client) if client is not None else local_submitter()
+    service = IngestService(submit, host="127.0.0.1", port=0, max_in_flight=args.max_in_flight, batch_size=batch_size, batch_delay=batch_delay)
+    await service.start()
+    payload = {"seconds": args.work_ms / 1000} if args.work_ms else {}
+    bodies = [json.dumps({"task": "sleep", "payload": payload}).encode()] * args.requests
+    latencies, statuses = [], {}
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(connection(service.port, bodies, latencies, statuses) for _ in range(args.connections)))
+    finally:
+        elapsed = time.perf_counter() - start
+        await service.close()
+    return latencies, statuses, elapsed, service.stats
+
+
+def report(name, latencies, statuses, elapsed, stats):
+    ok = len(latencies)
+    cuts = statistics.quantiles(latencies, n=100) if ok > 1 else [latencies[0]] * 99 if ok else [float("nan")] * 99
+    rejected = statuses.get(429, 0)
+    other = sum(statuses.values()) - ok - rejected
+    jobs_per_batch = stats["jobs"] / stats["batches"] if stats["batches"] else 0.0
+    print(
+        f"{name:<10} {ok / elapsed:>8.0f} {cuts[49] * 1000:>9.1f} {cuts[98] * 1000:>9.1f} {rejected:>6} {other:>6} {stats['batches']:>8} {jobs_per_batch:>11.1f}",
+    )
+
+
+async def main_async(client, args):
+    modes = {"batched": (args.batch_size, args.batch_delay_ms / 1000), "unbatched": (1, 0.0)}
+    print(f"{'mode':<10} {'req/s':>8} {'p50 ms':>9} {'p99 ms':>9} {'429':>6} {'errors':>6} {'batches':>8} {'jobs/batch':>11}")
+    for name, (batch_size, batch_delay) in modes.items():
+        # 先跑一小轮预热：worker 导入模块、建立连接
+        warmup = argparse.Namespace(**{**vars(args), "requests": args.connections})
+        await run_mode(client, warmup, batch_size, batch_delay)
+        report(name, *await run_mode(client, args, batch_size, batch_delay))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=("dask", "local"), default="dask")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=4, help="Threads per Dask worker")
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--work-ms", type=float, default=1.0, help="Time each job sleeps on the worker")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--batch-delay-ms", type=float, default=5.0)
+    parser.add_argument("--max-in-flight", type=int, default=10000, help="Lower it below --connections to see 429s")
+    args = parser.parse_args()
+
+    logger.remove()
+    print(f"{args.requests} requests over {args.connections} connections, {args.work_ms} ms of work per job, {args.backend} backend")
+    if args.backend == "local":
+        asyncio.run(main_async(None, args))
+        return
+    with LocalCluster(n_workers=args.workers, threads_per_worker=args.threads, dashboard_address=None) as cluster, Client(cluster) as client:
+        asyncio.run(main_async(client, args))
+
+
+if __name__ == "__main__":
+    main()
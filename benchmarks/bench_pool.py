@@ -0,0 +1,157 @@
+"""Benchmark: one connection per task vs. PooledResourcePlugin connections.
+
+A threaded TCP server in this process stands in for a WebSocket service: every new
+connection must complete a handshake that costs ``--handshake-ms`` on the server
+(think HTTP upgrade or TLS), after which each request line is echoed back. Dask
+tasks send one request each, either over a fresh connection or over a connection
+checked out from the worker's pool. After that the server drops every connection
+and the pooled run is repeated, so the health check and reconnect path must
+recover without failing a single task.
+
+Run from the project root::
+
+    uv run python -m benchmarks.bench_pool
+"""
+
+import argparse
+import contextlib
+import socket
+import socketserver
+import threading
+import time
+from functools import partial
+
+from dask.distributed import Client, LocalCluster
+
+from src.utils.dask_pool import PooledResourcePlugin, get_pool, get_pool_stats
+
+POOL = "standin"
+
+
+class StandInServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, handshake_ms):
+        self.handshake = handshake_ms / 1000
+        self.accepted = 0
+        self.active = set()
+        self.lock = threading.Lock()
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+
+    def drop_all(self):
+        with self.lock:
+            active, self.active = list(self.active), set()
+        for sock in active:
+            with contextlib.suppress(OSError):
+                sock.shutdown(socket.SHUT_RDWR)
+
+
+class StandInHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.accepted += 1
+            server.active.add(self.request)
+        if self.rfile.readline() != b"HELLO\n":
+            return
+        time.sleep(server.handshake)
+        self.wfile.write(b"OK\n")
+        for line in self.rfile:
+            self.wfile.write(line)
+
+
+class StandInConnection:
+    def __init__(self, host, port):
+        self.sock = socket.create_connection((host, port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.file = self.sock.makefile("rwb")
+        self.request(b"HELLO")
+
+    def request(self, payload):
+        self.file.write(payload + b"\n")
+        self.file.flush()
+        reply = self.file.readline()
+        if not reply:
+            raise ConnectionResetError("server closed the connection")
+        return reply.rstrip(b"\n")
+
+    def alive(self):
+        # 非阻塞地窥探一个字节：对端关闭时返回 b""
+        try:
+            return self.sock.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT) != b""
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+
+def per_task(i, host, port):
+    conn = StandInConnection(host, port)
+    try:
+        return conn.request(str(i).encode())
+    finally:
+        conn.close()
+
+
+def pooled(i):
+    with get_pool(POOL).connection() as conn:
+        return conn.request(str(i).encode())
+
+
+async def pooled_async(i):
+    async with get_pool(POOL).aconnection() as conn:
+        return conn.request(str(i).encode())
+
+
+def run(client, server, name, func, n, *args):
+    accepted = server.accepted
+    start = time.perf_counter()
+    results = client.gather(client.map(func, range(n), *[[a] * n for a in args], pure=False))
+    elapsed = time.perf_counter() - start
+    assert results == [str(i).encode() for i in range(n)], f"{name}: wrong replies"
+    print(f"{name:<22} {n / elapsed:>10.0f} tasks/s {server.accepted - accepted:>8} connections opened")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--handshake-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    server = StandInServer(args.handshake_ms)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+
+    with LocalCluster(n_workers=args.workers, threads_per_worker=args.threads, dashboard_address=None) as cluster, Client(cluster) as client:
+        client.register_plugin(
+            PooledResourcePlugin(
+                POOL,
+                partial(StandInConnection, host, port),
+                size=args.pool_size,
+                health_check=StandInConnection.alive,
+                backoff=0.05,
+            )
+        )
+        print(f"{args.workers} workers x {args.threads} threads, pool size {args.pool_size}, handshake {args.handshake_ms} ms")
+        run(client, server, "connection per task", per_task, args.tasks, host, port)
+        run(client, server, "pooled", pooled, args.tasks)
+        run(client, server, "pooled (async tasks)", pooled_async, args.tasks)
+        server.drop_all()
+        run(client, server, "pooled after drop", pooled, args.tasks)
+
+        for address, stats in get_pool_stats(client, POOL).items():
+            print(f"{address}: " + ", ".join(f"{k}={v:.2f}" if isinstance(v, float) else f"{k}={v}" for k, v in stats.items() if k != "name"))
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
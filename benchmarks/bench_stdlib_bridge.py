@@ -0,0 +1,92 @@
+"""Benchmark: stdlib -> loguru bridge under a noisy third-party logger.
+
+A ``distributed.worker``-style logger emits mostly DEBUG chatter while loguru only
+accepts INFO and above. The legacy setup (root level 0, two intercepting handlers)
+is compared with ``CustomizeLogger.intercept_stdlib``.
+
+Run from the project root::
+
+    uv run python -m benchmarks.bench_stdlib_bridge
+"""
+
+import argparse
+import logging
+import time
+
+from loguru import logger
+
+from src.utils.custom_logging import CustomizeLogger, loglevel_mapping
+
+
+class LegacyInterceptHandler(logging.Handler):
+    """The handler as it was before the bridge rewrite, kept here for comparison"""
+
+    def emit(self, record):
+        try:
+            level = logger.level(record.levelname).name
+        except AttributeError:
+            level = loglevel_mapping[record.levelno]
+
+        frame, depth = logging.currentframe(), 2
+        while frame.f_code.co_filename == logging.__file__:
+            frame = frame.f_back
+            depth += 1
+
+        log = logger.bind(request_id="app")
+        log.opt(depth=depth, exception=record.exc_info).log(level, record.getMessage())
+
+
+class Counter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, message):
+        self.count += 1
+
+
+def noisy_workload(records, info_every):
+    noisy = logging.getLogger("distributed.worker")
+    for i in range(records):
+        if i % info_every == 0:
+            noisy.info("task %s finished", i)
+        else:
+            noisy.debug("transition %s: waiting -> ready", i)
+
+
+def run(setup, records, info_every):
+    sink = Counter()
+    logger.remove()
+    logger.add(sink, level="INFO", format="{message}")
+    setup()
+    start = time.perf_counter()
+    noisy_workload(records, info_every)
+    elapsed = time.perf_counter() - start
+    return records / elapsed, sink.count
+
+
+def legacy_setup():
+    logging.getLogger("distributed").handlers = []
+    logging.getLogger("distributed").propagate = True
+    logging.getLogger("distributed").setLevel(logging.NOTSET)
+    logging.basicConfig(handlers=[LegacyInterceptHandler(), LegacyInterceptHandler()], level=0, force=True)
+
+
+def bridge_setup():
+    CustomizeLogger.intercept_stdlib("info")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=200_000)
+    parser.add_argument("--info-every", type=int, default=50, help="one INFO record per N calls, the rest are DEBUG")
+    args = parser.parse_args()
+
+    before, before_count = run(legacy_setup, args.records, args.info_every)
+    after, after_count = run(bridge_setup, args.records, args.info_every)
+    print(f"stdlib calls: {args.records}, INFO ratio: 1/{args.info_every}")
+    print(f"legacy handlers : {before:>12,.0f} calls/s  ({before_count} records delivered)")
+    print(f"single bridge   : {after:>12,.0f} calls/s  ({after_count} records delivered, {after / before:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Benchmark: per-task overhead of TaskMetricsPlugin on the worker.
+
+Drives the plugin's ``transition`` hook the way the worker state machine does
+(``ready -> executing`` then ``executing -> memory`` per task) and reports the
+cost per task. The removed ``Counter`` plugin, which logged every transition at
+INFO, is included for comparison with loguru writing to a no-op sink.
+
+Run from the project root::
+
+    uv run python -m benchmarks.bench_task_metrics
+"""
+
+import argparse
+import time
+
+from loguru import logger
+
+from src.utils.dask_metrics import TaskMetricsPlugin
+
+
+class FakeTask:
+    __slots__ = ("prefix",)
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+
+class FakeState:
+    def __init__(self):
+        self.tasks = {}
+
+
+class FakeWorker:
+    def __init__(self):
+        self.state = FakeState()
+        self.periodic_callbacks = {}
+        self.sent = 0
+
+    def batched_send(self, msg):
+        self.sent += 1
+
+
+class NoopPlugin:
+    def transition(self, key, start, finish, *args, **kwargs):
+        pass
+
+
+class LegacyCounter:
+    """The transition hook of the removed Counter plugin"""
+
+    def __init__(self):
+        self.counter = 0
+
+    def transition(self, key, start, finish, *args, **kwargs):
+        logger.info(f"XXXXXXXXXX Counter transition, start: {start}")
+        if start == "executing":
+            self.counter += 1
+
+
+def drive(plugin, keys):
+    transition = plugin.transition
+    start = time.perf_counter()
+    for key in keys:
+        transition(key, "ready", "executing")
+        transition(key, "executing", "memory")
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=200_000)
+    parser.add_argument("--prefixes", type=int, default=20)
+    args = parser.parse_args()
+
+    worker = FakeWorker()
+    keys = []
+    for i in range(args.tasks):
+        key = f"task{i % args.prefixes}-{i:032x}"
+        worker.state.tasks[key] = FakeTask(f"task{i % args.prefixes}")
+        keys.append(key)
+
+    plugin = TaskMetricsPlugin(interval=3600)
+    plugin.setup(worker)
+    worker.periodic_callbacks[plugin.name].stop()
+
+    logger.remove()
+    logger.add(lambda message: None, level="INFO", format="{message}")
+
+    baseline = drive(NoopPlugin(), keys)
+    metrics = drive(plugin, keys)
+    legacy = drive(LegacyCounter(), keys[: args.tasks // 10]) * 10
+
+    print(f"tasks: {args.tasks}, prefixes: {args.prefixes}")
+    print(f"empty hook        {baseline / args.tasks * 1e6:8.3f} us/task")
+    print(f"TaskMetricsPlugin {metrics / args.tasks * 1e6:8.3f} us/task  (+{(metrics - baseline) / args.tasks * 1e6:.3f} us over an empty hook)")
+    print(f"legacy Counter    {legacy / args.tasks * 1e6:8.3f} us/task")
+    stats = plugin.snapshot()
+    assert sum(sum(counts) for counts, _, _ in stats.values()) == args.tasks
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Benchmark: short Dask sessions on a cold cluster vs. a warm pool.
+
+Each session gets the client from ``DaskClientSingleton``, runs ``--tasks`` small tasks
+that import ``--modules`` and closes again, the way a short job does. ``cold`` closes
+the cluster after every session; ``warm`` keeps the workers (``close(keep_warm=True)``)
+and ``warm + preload`` also imports the modules when the workers start. Reported are
+the first session, the mean of the following ones and the total.
+
+Run from the project root::
+
+    uv run python -m benchmarks.bench_warm_pool
+"""
+
+import argparse
+import asyncio
+import importlib
+import time
+
+from src.utils.dask import DaskClientSingleton
+
+
+def task(i, modules):
+    for name in modules:
+        importlib.import_module(name)
+    return i
+
+
+def session(args, modules):
+    start = time.perf_counter()
+    client = DaskClientSingleton().get_client()
+    client.wait_for_workers(args.workers)
+    results = client.gather(client.map(task, range(args.tasks), modules=modules, pure=False))
+    assert results == list(range(args.tasks))
+    return time.perf_counter() - start
+
+
+def run(name, args, keep_warm, preload):
+    modules = args.modules.split(",")
+    DaskClientSingleton.set_overrides(
+        n_workers=args.workers,
+        threads_per_worker=args.threads,
+        scheduler_port=0,
+        dashboard_address=None,
+        preload=modules if preload else [],
+    )
+    times = []
+    for _ in range(args.sessions):
+        elapsed = session(args, modules)
+        asyncio.run(DaskClientSingleton.close(keep_warm=keep_warm))
+        times.append(elapsed)
+    asyncio.run(DaskClientSingleton.close(keep_warm=False))
+    DaskClientSingleton.set_overrides()
+    rest = times[1:] or times
+    print(f"{name:<16} first {times[0]:>7.3f} s   next {sum(rest) / len(rest):>7.3f} s   total {sum(times):>7.3f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=5)
+    parser.add_argument("--tasks", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--modules", default="numpy", help="Comma separated modules the tasks import")
+    args = parser.parse_args()
+
+    print(f"{args.sessions} sessions of {args.tasks} tasks on {args.workers} workers x {args.threads} threads, importing {args.modules}")
+    run("cold", args, keep_warm=False, preload=False)
+    run("warm", args, keep_warm=True, preload=False)
+    run("warm + preload", args, keep_warm=True, preload=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,31 @@
-from .utils import Config, CustomizeLogger
+from functools import cache
 
-gen_config = Config().get_config()
-logger = CustomizeLogger.make_logger(gen_config["log"])
+from . import utils
+from .utils.profiling import span
+
+
+@cache
+def get_logger():
+    """Load the config and build the logger on first use rather than at import time"""
+    with span("config"):
+        config = utils.Config()
+        gen_config = config.get_config()
+    with span("logger"):
+        logger = utils.CustomizeLogger.make_logger(gen_config["log"])
+
+        # 配置文件修改后，日志级别、过滤和采样规则原地生效
+        utils.Config.subscribe(utils.CustomizeLogger.apply_config_change)
+        watch = gen_config.get("watch") or {}
+        if watch.get("enabled"):
+            config.watch(poll_interval=watch.get("poll_interval", 1.0))
+    return logger
 
 
 async def start():
+    logger = get_logger()
     logger.info("Hello from py-project-template!")
+
+    # 任务接入服务：一直运行到被取消（Ctrl+C）
+    http_config = utils.Config().get_config().get("http") or {}
+    if http_config.get("enabled"):
+        await utils.serve_ingest(http_config)
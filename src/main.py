@@ -1,6 +1,88 @@
+import asyncio
+import contextlib
+import importlib
+
+import click
+
 from .app import start
+from .utils.profiling import PROFILERS, profiled, timed_run, traced_allocations
+
+TIMINGS_PATH = "outputs/timings.json"
+
+
+class LazyGroup(click.Group):
+    """Click group whose subcommands are imported only when they are looked up"""
+
+    def __init__(self, *args, lazy_commands=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # 命令名 -> "模块:属性"，模块相对于本包；dask、numpy 等只在用到的命令里导入
+        self.lazy_commands = lazy_commands or {}
+
+    def list_commands(self, ctx):
+        return sorted({*super().list_commands(ctx), *self.lazy_commands})
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name not in self.lazy_commands:
+            return super().get_command(ctx, cmd_name)
+        module, attr = self.lazy_commands[cmd_name].split(":")
+        return getattr(importlib.import_module(module, __package__), attr)
 
-if __name__ == "__main__":
-    import asyncio
 
-    asyncio.run(start())
+@click.group(
+    cls=LazyGroup,
+    invoke_without_command=True,
+    lazy_commands={
+        "convert": ".utils.audio_batch:convert_command",
+    },
+)
+@click.pass_context
+def main(ctx):
+    """Project command line; without a command it runs the application."""
+    if ctx.invoked_subcommand is None:
+        ctx.invoke(run)
+
+
+@main.command()
+@click.option("--profile", "profile_path", type=click.Path(dir_okay=False), help="Profile the run into this file: pstats for cprofile, folded stacks for sampling")
+@click.option("--profiler", type=click.Choice(PROFILERS), default="cprofile", show_default=True, help="cprofile is exact but slows the main thread; sampling is cheap and covers all threads")
+@click.option("--sample-interval", type=float, default=5.0, show_default=True, help="Milliseconds between samples for --profiler sampling")
+@click.option("--trace-malloc", is_flag=True, help="Trace allocations and log the top allocation sites at exit")
+@click.option("--timings", "timings_path", is_flag=False, flag_value=TIMINGS_PATH, type=click.Path(dir_okay=False), help=f"Log per-phase wall-clock spans and write them as JSON  [default file: {TIMINGS_PATH}]")
+@click.option("--top", type=int, default=20, show_default=True, help="Entries in the profile and allocation reports")
+def run(profile_path, profiler, sample_interval, trace_malloc, timings_path, top):  # noqa: PLR0913, PLR0917
+    """Run the application until it finishes or is interrupted."""
+    with contextlib.ExitStack() as stack:
+        # 没打开的开关不进入任何上下文，运行路径与不带开关时完全相同
+        if timings_path:
+            stack.enter_context(timed_run(timings_path))
+        if trace_malloc:
+            stack.enter_context(traced_allocations(top))
+        if profile_path:
+            stack.enter_context(profiled(profile_path, profiler, sample_interval / 1000, top))
+        with contextlib.suppress(KeyboardInterrupt):
+            asyncio.run(start())
+
+
+@main.group(
+    cls=LazyGroup,
+    lazy_commands={
+        "query": ".utils.log_store:query_command",
+    },
+)
+def logs():
+    """Inspect the structured logs."""
+
+
+@main.group(
+    cls=LazyGroup,
+    lazy_commands={
+        "bench": ".utils.cluster_bench:bench_command",
+        "serve": ".utils.dask_warm:serve_command",
+    },
+)
+def cluster():
+    """Benchmark the local Dask cluster or keep one running."""
+
+
+if __name__ == "__main__":
+    main()
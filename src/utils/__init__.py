@@ -1,11 +1,50 @@
-from .config import Config
-from .custom_logging import CustomizeLogger
-from .dask import DaskClientSingleton, get_dask_client, init_dask
+import importlib
+
+# 按需导入：访问某个名字时才加载对应子模块，避免在 import 阶段就引入 dask 等重量级依赖
+_EXPORTS = {
+    "Config": ".config",
+    "CustomizeLogger": ".custom_logging",
+    "init_dask": ".dask",
+    "get_dask_client": ".dask",
+    "get_async_dask_client": ".dask",
+    "get_metrics": ".dask",
+    "get_result_cache": ".dask",
+    "get_router": ".dask",
+    "DaskClientSingleton": ".dask",
+    "IngestService": ".ingest",
+    "log_context": ".log_scope",
+    "get_context": ".log_scope",
+    "new_request_id": ".log_scope",
+    "serve_ingest": ".ingest",
+}
 
 __all__ = [
     "Config",
     "CustomizeLogger",
     "init_dask",
     "get_dask_client",
+    "get_async_dask_client",
+    "get_metrics",
+    "get_result_cache",
+    "get_router",
     "DaskClientSingleton",
+    "IngestService",
+    "log_context",
+    "get_context",
+    "new_request_id",
+    "serve_ingest",
 ]
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    # 缓存到模块命名空间，之后的访问不再经过 __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,342 @@
+import contextlib
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import click
+from loguru import logger
+
+from .audio_manifest import MANIFEST_NAME, ConversionManifest, plan, reuse_output
+from .audio_resample import QUALITIES
+from .audio_stream import RESAMPLERS
+from .utils import _convert, target_num_channels, target_sample_rate
+
+BACKENDS = ("process", "dask", "serial")
+
+
+class ConversionResult:
+    """Outcome of one file; ``error`` is None on success.
+
+    ``action`` is ``"converted"``, or in incremental mode ``"skipped"`` (output up to
+    date) and ``"linked"`` / ``"copied"`` (output of identical content reused).
+    """
+
+    __slots__ = ("source", "target", "size", "seconds", "error", "action")
+
+    def __init__(self, source, target, size, seconds=0.0, error=None, action="converted"):  # noqa: PLR0913, PLR0917
+        self.source = source
+        self.target = target
+        self.size = size
+        self.seconds = seconds
+        self.error = error
+        self.action = action
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def to_dict(self) -> dict:
+        return {"source": self.source, "target": self.target, "size": self.size, "seconds": self.seconds, "error": self.error, "action": self.action}
+
+
+class BatchReport:
+    """Per-file results of a batch plus totals"""
+
+    def __init__(self, results, seconds):
+        self.results = results
+        self.seconds = seconds
+
+    @property
+    def errors(self) -> list:
+        return [r for r in self.results if not r.ok]
+
+    def _count(self, *actions):
+        return sum(r.ok and r.action in actions for r in self.results)
+
+    @property
+    def converted(self) -> int:
+        return self._count("converted")
+
+    @property
+    def skipped(self) -> int:
+        return self._count("skipped")
+
+    @property
+    def reused(self) -> int:
+        return self._count("linked", "copied")
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(r.size for r in self.results)
+
+    def to_dict(self) -> dict:
+        return {
+            "files": len(self.results),
+            "converted": self.converted,
+            "skipped": self.skipped,
+            "reused": self.reused,
+            "failed": len(self.errors),
+            "seconds": self.seconds,
+            "files_per_s": len(self.results) / self.seconds if self.seconds else 0.0,
+            "mb_per_s": self.total_bytes / 2**20 / self.seconds if self.seconds else 0.0,
+            "results": [r.to_dict() for r in self.results],
+        }
+
+
+class Progress:
+    """Counts finished files and logs progress and throughput at most every ``interval`` seconds"""
+
+    def __init__(self, total_files, total_bytes, interval=5.0, callback=None):
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.interval = interval
+        self.callback = callback
+        self.done = 0
+        self.failed = 0
+        self.bytes_done = 0
+        self.started = time.perf_counter()
+        self._logged = self.started
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def update(self, result):
+        self.done += 1
+        self.failed += not result.ok
+        self.bytes_done += result.size
+        if self.callback is not None:
+            self.callback(self, result)
+        now = time.perf_counter()
+        if now - self._logged >= self.interval or self.done == self.total_files:
+            self._logged = now
+            logger.info(str(self))
+
+    def __str__(self):
+        elapsed = max(self.elapsed, 1e-9)
+        rate = self.bytes_done / elapsed
+        eta = (self.total_bytes - self.bytes_done) / rate if rate else float("inf")
+        return f"Converted {self.done}/{self.total_files} files ({self.failed} failed), {self.done / elapsed:.1f} files/s, {rate / 2**20:.1f} MB/s, ETA {eta:.0f}s"
+
+
+def find_jobs(input_dir, output_dir=None, patterns=("*.mp3",)):
+    """[(source, target, size)] for files matching the globs, largest first.
+
+    Targets mirror the source layout under ``output_dir`` (default: next to the
+    source) with a ``.wav`` suffix. Largest-first keeps one long file from starting
+    last and holding up the whole batch.
+    """
+    output_dir = output_dir or input_dir
+    jobs = {}
+    for pattern in patterns:
+        for relative in glob.glob(pattern, root_dir=input_dir, recursive=True):
+            source = os.path.join(input_dir, relative)
+            if source in jobs or not os.path.isfile(source):
+                continue
+            target = os.path.join(output_dir, os.path.splitext(relative)[0] + ".wav")
+            jobs[source] = (source, target, os.path.getsize(source))
+    return sorted(jobs.values(), key=lambda job: job[2], reverse=True)
+
+
+def convert_one(source, target, size, sample_rate=target_sample_rate, channels=target_num_channels, streaming=False, resampler="linear", quality="default"):  # noqa: PLR0913, PLR0917
+    """Convert one file and return a ConversionResult instead of raising"""
+    start = time.perf_counter()
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+        _convert(source, target, sample_rate, channels, streaming, resampler, quality)
+    except Exception as e:
+        return ConversionResult(source, target, size, time.perf_counter() - start, {"type": type(e).__name__, "message": str(e)})
+    return ConversionResult(source, target, size, time.perf_counter() - start)
+
+
+def _run_serial(jobs, options):
+    for job in jobs:
+        yield convert_one(*job, **options)
+
+
+def _run_process(jobs, options, max_workers):
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        # 按从大到小的顺序提交，进程池按提交顺序取任务
+        futures = {pool.submit(convert_one, *job, **options): job for job in jobs}
+        for future in as_completed(futures):
+            yield _result(future, futures[future])
+
+
+def _run_dask(jobs, options):
+    from dask.distributed import as_completed as dask_as_completed  # noqa: PLC0415
+
+    from .dask import get_dask_client  # noqa: PLC0415
+
+    client = get_dask_client()
+    if client is None:
+        raise RuntimeError("Dask client is not available")
+    # priority 越大越先调度，保持从大到小的顺序
+    futures = {client.submit(convert_one, *job, **options, priority=len(jobs) - i, pure=False): job for i, job in enumerate(jobs)}
+    for future in dask_as_completed(futures):
+        yield _result(future, futures[future])
+
+
+def _result(future, job):
+    # convert_one 自己不抛异常，这里兜底的是进程崩溃、序列化失败等执行层面的错误
+    try:
+        return future.result()
+    except Exception as e:
+        return ConversionResult(job[0], job[1], job[2], error={"type": type(e).__name__, "message": str(e)})
+
+
+def _plan_incremental(jobs, manifest, params):
+    """Results for up-to-date jobs, the jobs left to convert and the duplicates to reuse"""
+    jobs = [(os.path.abspath(source), os.path.abspath(target), size) for source, target, size in jobs]
+    fresh, convert, reuse = plan(jobs, manifest, params)
+    done = [ConversionResult(*job, action="skipped") for job in fresh]
+    meta = {job[0]: (digest, mtime_ns) for job, digest, mtime_ns in convert}
+    for job, _, _ in convert:
+        # 硬链接的输出与其它文件共享内容，原地覆盖前先断开
+        with contextlib.suppress(FileNotFoundError):
+            if os.stat(job[1]).st_nlink > 1:
+                os.remove(job[1])
+    logger.info(f"{len(fresh)} files up to date, {len(reuse)} duplicates of other sources, {len(convert)} to convert")
+    return done, [job for job, _, _ in convert], reuse, meta
+
+
+def _update_manifest(manifest, converted, reuse, meta, params):
+    """Record the conversions, then point duplicates at their outputs; returns the duplicates' results"""
+    failed = set()
+    for result in converted:
+        if result.ok:
+            manifest.record(result.source, result.size, meta[result.source][1], meta[result.source][0], params, result.target)
+        else:
+            manifest.forget(result.source)
+            failed.add(result.target)
+    results = []
+    for (source, target, size), digest, mtime_ns, output in reuse:
+        if output in failed:
+            results.append(ConversionResult(source, target, size, error={"type": "DuplicateError", "message": f"same content as the failed conversion to {output}"}))
+            continue
+        try:
+            action = reuse_output(output, target)
+        except OSError as e:
+            results.append(ConversionResult(source, target, size, error={"type": type(e).__name__, "message": str(e)}))
+            continue
+        manifest.record(source, size, mtime_ns, digest, params, target)
+        results.append(ConversionResult(source, target, size, action=action))
+    return results
+
+
+def _convert_jobs(jobs, backend, max_workers, options, progress):
+    if backend == "serial":
+        results = _run_serial(jobs, options)
+    elif backend == "dask":
+        results = _run_dask(jobs, options)
+    else:
+        results = _run_process(jobs, options, max_workers)
+    for result in results:
+        progress.update(result)
+        if not result.ok:
+            logger.warning(f"Failed to convert {result.source}: {result.error['type']}: {result.error['message']}")
+        yield result
+
+
+def convert_batch(  # noqa: PLR0913
+    input_dir,
+    output_dir=None,
+    patterns=("*.mp3",),
+    *,
+    backend="process",
+    max_workers=None,
+    sample_rate=target_sample_rate,
+    channels=target_num_channels,
+    streaming=False,
+    resampler="linear",
+    quality="default",
+    incremental=False,
+    manifest_path=None,
+    progress_interval=5.0,
+    on_progress=None,
+) -> BatchReport:
+    """Convert every file under ``input_dir`` matching ``patterns`` to WAV in parallel.
+
+    ``backend`` is ``"process"`` (a local process pool of ``max_workers``), ``"dask"``
+    (the shared Dask cluster) or ``"serial"``. Failures do not stop the batch; they are
+    returned in ``BatchReport.errors``. ``on_progress(progress, result)`` is called
+    after every conversion. ``streaming`` converts in constant memory and ``resampler``
+    / ``quality`` pick the resampling filter, see ``audio_stream`` and ``audio_resample``.
+
+    With ``incremental`` a ``ConversionManifest`` (default: ``.convert-manifest`` in the
+    output directory) skips sources whose output is up to date and hard-links or
+    copies the output of identical content instead of converting it again.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+    start = time.perf_counter()
+    jobs = find_jobs(input_dir, output_dir, patterns)
+    # streaming 与否输出相同，不计入参数
+    params = (sample_rate, channels, resampler, quality if resampler == "polyphase" else None)
+    manifest = ConversionManifest(manifest_path or os.path.join(output_dir or input_dir, MANIFEST_NAME)) if incremental else None
+    report, reuse, meta = [], [], {}
+    if manifest is not None:
+        report, jobs, reuse, meta = _plan_incremental(jobs, manifest, params)
+
+    total_bytes = sum(job[2] for job in jobs)
+    logger.info(f"Converting {len(jobs)} files ({total_bytes / 2**20:.1f} MB) from {input_dir} with the {backend} backend")
+    converted = []
+    if jobs:
+        progress = Progress(len(jobs), total_bytes, interval=progress_interval, callback=on_progress)
+        options = {"sample_rate": sample_rate, "channels": channels, "streaming": streaming, "resampler": resampler, "quality": quality}
+        converted = list(_convert_jobs(jobs, backend, max_workers, options, progress))
+    report.extend(converted)
+
+    if manifest is not None:
+        report.extend(_update_manifest(manifest, converted, reuse, meta, params))
+        manifest.save()
+    return BatchReport(report, time.perf_counter() - start)
+
+
+@click.command("convert")
+@click.argument("input_dir", type=click.Path(exists=True, file_okay=False))
+@click.argument("output_dir", required=False, type=click.Path(file_okay=False))
+@click.option("--glob", "patterns", multiple=True, default=("*.mp3",), show_default=True, help="Glob relative to INPUT_DIR, repeatable; ** recurses")
+@click.option("--backend", type=click.Choice(BACKENDS), default="process", show_default=True)
+@click.option("--workers", type=int, help="Process pool size, default: CPU count")
+@click.option("--sample-rate", type=int, default=target_sample_rate, show_default=True)
+@click.option("--channels", type=int, default=target_num_channels, show_default=True)
+@click.option("--streaming", is_flag=True, help="Decode and write in fixed-size chunks, for long recordings")
+@click.option("--resampler", type=click.Choice(RESAMPLERS), default="linear", show_default=True, help="linear matches pydub, polyphase avoids aliasing (implies --streaming)")
+@click.option("--quality", type=click.Choice(tuple(QUALITIES)), default="default", show_default=True, help="Polyphase filter length and steepness")
+@click.option("--incremental", is_flag=True, help="Skip up-to-date outputs and reuse outputs of identical sources")
+@click.option("--manifest", "manifest_path", type=click.Path(dir_okay=False), help=f"Manifest for --incremental, default: OUTPUT_DIR/{MANIFEST_NAME}")
+@click.option("--report", type=click.Path(dir_okay=False), help="Write the per-file results as JSON")
+def convert_command(input_dir, output_dir, patterns, backend, workers, sample_rate, channels, streaming, resampler, quality, incremental, manifest_path, report):  # noqa: PLR0913, PLR0917
+    """Convert MP3 files under INPUT_DIR to WAV, into OUTPUT_DIR or next to the sources."""
+    result = convert_batch(
+        input_dir,
+        output_dir,
+        patterns,
+        backend=backend,
+        max_workers=workers,
+        sample_rate=sample_rate,
+        channels=channels,
+        streaming=streaming,
+        resampler=resampler,
+        quality=quality,
+        incremental=incremental,
+        manifest_path=manifest_path,
+    )
+    summary = result.to_dict()
+    click.echo(
+        f"{summary['files']} files in {summary['seconds']:.1f}s: {summary['converted']} converted, {summary['reused']} reused, "
+        f"{summary['skipped']} up to date, {summary['failed']} failed ({summary['files_per_s']:.1f} files/s, {summary['mb_per_s']:.1f} MB/s)"
+    )
+    for error in result.errors:
+        click.echo(f"FAILED {error.source}: {error.error['type']}: {error.error['message']}", err=True)
+    if report:
+        with open(report, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+    if result.errors:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    convert_command()
@@ -0,0 +1,148 @@
+import contextlib
+import hashlib
+import marshal
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+from loguru import logger
+
+MANIFEST_NAME = ".convert-manifest"
+_VERSION = 1
+_READ_SIZE = 2**20
+
+
+def file_digest(path) -> str:
+    """blake2b of the file contents"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while block := f.read(_READ_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def link_or_copy(existing, target) -> str:
+    """Make ``target`` a hard link to ``existing``, or a copy across file systems; returns which"""
+    os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    try:
+        os.link(existing, tmp_path)
+        how = "linked"
+    except OSError:
+        shutil.copy2(existing, tmp_path)
+        how = "copied"
+    os.replace(tmp_path, target)
+    return how
+
+
+def _stat_key(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class ConversionManifest:
+    """Persistent record of finished conversions, stored with ``marshal``.
+
+    Each source path maps to its size, mtime, content digest, the conversion
+    parameters and the output together with the output's size and mtime. A source
+    whose stat, parameters and output all still match is skipped without reading it;
+    otherwise its digest decides whether an existing output of the same content and
+    parameters can be reused.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        try:
+            with open(path, "rb") as f:
+                version, entries = marshal.load(f)
+            if version == _VERSION:
+                self.entries = entries
+        except FileNotFoundError:
+            pass
+        except (OSError, EOFError, ValueError, TypeError) as e:
+            # 清单损坏时从头开始，只是少了跳过的机会
+            logger.warning(f"Ignoring unreadable conversion manifest {path}: {e}")
+        # (digest, params) -> 转换出该内容的 source
+        self._by_content = {(entry[2], entry[3]): source for source, entry in self.entries.items()}
+
+    @staticmethod
+    def _output_valid(entry):
+        try:
+            return _stat_key(entry[4]) == (entry[5], entry[6])
+        except OSError:
+            return False
+
+    def fresh(self, source, size, mtime_ns, params, target) -> bool:
+        """Stat-only check that ``source`` was already converted to ``target`` with ``params``"""
+        entry = self.entries.get(source)
+        return entry is not None and entry[:2] == (size, mtime_ns) and entry[3] == params and entry[4] == target and self._output_valid(entry)
+
+    def output_for(self, digest, params):
+        """A still valid output converted from the same content with the same parameters"""
+        entry = self.entries.get(self._by_content.get((digest, params)))
+        if entry is None or entry[2:4] != (digest, params) or not self._output_valid(entry):
+            return None
+        return entry[4]
+
+    def record(self, source, size, mtime_ns, digest, params, target):  # noqa: PLR0913, PLR0917
+        target_size, target_mtime_ns = _stat_key(target)
+        self.entries[source] = (size, mtime_ns, digest, params, target, target_size, target_mtime_ns)
+        self._by_content[(digest, params)] = source
+
+    def forget(self, source):
+        self.entries.pop(source, None)
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            marshal.dump((_VERSION, self.entries), f)
+        os.replace(tmp_path, self.path)
+
+
+def plan(jobs, manifest, params, hash_workers=8):
+    """Split ``[(source, target, size)]`` jobs into what still has to be done.
+
+    Returns ``(fresh, convert, reuse)``: jobs whose output is up to date, ``(job,
+    digest, mtime_ns)`` that must be converted, and ``(job, digest, mtime_ns, output)``
+    whose content was or will be converted to ``output`` already. Only sources that
+    fail the stat check are hashed, on a thread pool.
+    """
+    fresh, stale = [], []
+    for job in jobs:
+        source, target, size = job
+        mtime_ns = os.stat(source).st_mtime_ns
+        if manifest.fresh(source, size, mtime_ns, params, target):
+            fresh.append(job)
+        else:
+            stale.append((job, mtime_ns))
+
+    with ThreadPoolExecutor(max_workers=hash_workers) as pool:
+        digests = list(pool.map(lambda item: file_digest(item[0][0]), stale))
+
+    # 本次要重新生成的输出；清单里指向它们的旧内容不能再复用
+    rewritten = {job[1]: digest for (job, _), digest in zip(stale, digests, strict=True)}
+    convert, reuse, pending = [], [], {}
+    for (job, mtime_ns), digest in zip(stale, digests, strict=True):
+        output = manifest.output_for(digest, params)
+        if output is not None and rewritten.get(output, digest) != digest:
+            output = None
+        output = output or pending.get(digest)
+        if output is None:
+            # 本次运行中第一次出现的内容：转换它，之后相同内容的文件复用它的输出
+            pending[digest] = job[1]
+            convert.append((job, digest, mtime_ns))
+        else:
+            reuse.append((job, digest, mtime_ns, output))
+    return fresh, convert, reuse
+
+
+def reuse_output(output, target) -> str:
+    """Point ``target`` at an existing ``output`` of the same content: ``"skipped"``, ``"linked"`` or ``"copied"``"""
+    if os.path.abspath(output) == os.path.abspath(target):
+        return "skipped"
+    with contextlib.suppress(FileNotFoundError):
+        if os.path.samefile(output, target):
+            return "skipped"
+    return link_or_copy(output, target)
@@ -0,0 +1,169 @@
+import math
+from functools import lru_cache
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# 质量档位：(每侧过零点数, 截止频率占新 Nyquist 的比例, Kaiser 窗 beta)
+QUALITIES = {
+    "fast": (8, 0.90, 6.0),
+    "default": (16, 0.94, 8.6),
+    "best": (32, 0.97, 12.0),
+}
+# resample_batch 每次拼接处理的帧数，缓冲区保持在 CPU 缓存能较好利用的大小
+BATCH_FRAMES = 2**18
+
+
+@lru_cache(maxsize=32)
+def filter_bank(in_rate, out_rate, quality="default"):
+    """Polyphase filter bank for ``in_rate -> out_rate``, built once per rate pair and quality.
+
+    Returns ``(up, down, half, bank)``: the reduced ratio ``up/down``, the number of
+    input samples the filter reaches on either side, and a read-only ``(up, 2*half+1)``
+    array whose row ``p`` holds the (reversed) taps of phase ``p``.
+    """
+    if quality not in QUALITIES:
+        raise ValueError(f"Unknown quality {quality!r}, expected one of {tuple(QUALITIES)}")
+    zero_crossings, rolloff, beta = QUALITIES[quality]
+    divisor = math.gcd(in_rate, out_rate)
+    up, down = out_rate // divisor, in_rate // divisor
+    # 在上采样后的采样率下设计低通：截止在两个采样率中较小者的 Nyquist 以内
+    cutoff = rolloff * 0.5 / max(up, down)
+    half = math.ceil(zero_crossings * max(1.0, down / up) / rolloff)
+    length = 2 * half * up + 1
+    t = np.arange(length) - half * up
+    prototype = 2 * cutoff * np.sinc(2 * cutoff * t) * np.kaiser(length, beta) * up
+    taps = 2 * half + 1
+    padded = np.zeros(up * taps)
+    padded[:length] = prototype
+    # padded[p + i*up] 是相位 p 的第 i 个系数，作用于 x[k + half - i]；反转后可直接与窗口内的样本逐项相乘
+    bank = padded.reshape(taps, up).T[:, ::-1].copy()
+    bank.setflags(write=False)
+    return up, down, half, bank
+
+
+def _output_length(frames, up, down):
+    return -(-frames * up // down)
+
+
+def _apply(padded, start, count, spec, offset=0):
+    """Outputs ``start .. start+count`` from zero-padded samples whose first row is padded index ``offset``"""
+    up, down, _, bank = spec
+    out = np.empty((count, *padded.shape[1:]))
+    if not count:
+        return out
+    windows = sliding_window_view(padded, bank.shape[1], axis=0)
+    # 相位为 p 的输出每隔 up 个出现一次，对应的输入窗口每次前进 down 个样本：
+    # 每个相位只需一次跨步视图上的矩阵乘法
+    inverse = pow(down, -1, up) if up > 1 else 0
+    for phase in range(up):
+        first = start + (phase * inverse - start) % up
+        if first >= start + count:
+            continue
+        rows = len(range(first, start + count, up))
+        base = first * down // up - offset
+        out[first - start :: up] = windows[base : base + (rows - 1) * down + 1 : down] @ bank[phase]
+    return out
+
+
+def _to_dtype(values, dtype):
+    if np.issubdtype(dtype, np.integer):
+        info = np.iinfo(dtype)
+        return np.clip(np.rint(values), info.min, info.max).astype(dtype)
+    return values.astype(dtype, copy=False)
+
+
+def resample(samples, in_rate, out_rate, quality="default"):
+    """Resample ``(frames,)`` or ``(frames, channels)`` samples; integer input gives rounded, clipped integers"""
+    samples = np.asarray(samples)
+    if in_rate == out_rate:
+        return samples.copy()
+    spec = up, down, half, _ = filter_bank(in_rate, out_rate, quality)
+    pad = [(half, half + 1)] + [(0, 0)] * (samples.ndim - 1)
+    padded = np.pad(samples.astype(np.float64), pad)
+    return _to_dtype(_apply(padded, 0, _output_length(len(samples), up, down), spec), samples.dtype)
+
+
+def _resample_group(clips, spec):
+    up, down, half, _ = spec
+    # 补零序列中输出 m 的中心在 m*down/up + half；clip 起点减去 half 是 down 的整数倍时，
+    # 它的第一个输出正好落在整数序号 (start - half)*up/down 上
+    starts, position = [], half
+    for clip in clips:
+        start = half + -(-(position - half) // down) * down
+        starts.append(start)
+        position = start + len(clip) + 2 * half + 1
+    buffer = np.zeros((position + 2 * half + 1, *clips[0].shape[1:]))
+    spans = []
+    for start, clip in zip(starts, clips, strict=True):
+        buffer[start : start + len(clip)] = clip
+        first = (start - half) * up // down
+        spans.append((first, first + _output_length(len(clip), up, down)))
+    out = _apply(buffer, 0, spans[-1][1], spec)
+    return [_to_dtype(out[first:end], clip.dtype) for (first, end), clip in zip(spans, clips, strict=True)]
+
+
+def resample_batch(clips, in_rate, out_rate, quality="default", group_frames=BATCH_FRAMES):
+    """Resample many clips that share ``in_rate``, several clips per pass.
+
+    Clips are laid out in shared buffers of about ``group_frames`` frames, aligned so
+    that each one starts on an output sample and separated by enough zeros that the
+    filter never reaches into a neighbour, so every result is exactly what ``resample``
+    returns for that clip. Short clips gain the most: one pass replaces hundreds of
+    small ones.
+    """
+    clips = [np.asarray(clip) for clip in clips]
+    if in_rate == out_rate:
+        return [clip.copy() for clip in clips]
+    spec = filter_bank(in_rate, out_rate, quality)
+    results, group, frames = [], [], 0
+    for clip in clips:
+        group.append(clip)
+        frames += len(clip)
+        if frames >= group_frames:
+            results.extend(_resample_group(group, spec))
+            group, frames = [], 0
+    if group:
+        results.extend(_resample_group(group, spec))
+    return results
+
+
+class PolyphaseResampler:
+    """Streaming polyphase resampler with the same ``process``/``flush`` interface as ``LinearResampler``.
+
+    Keeps the last few input frames the filter still needs between chunks; call
+    ``flush()`` after the last chunk for the remaining output frames. The concatenated
+    output equals ``resample`` on the whole signal.
+    """
+
+    def __init__(self, in_rate, out_rate, channels, quality="default"):
+        self._spec = self.up, self.down, self.half, self.bank = filter_bank(in_rate, out_rate, quality)
+        self.channels = channels
+        self._buffer = np.zeros((self.half, channels))
+        self._offset = 0  # _buffer[0] 在补零后序列中的位置
+        self._consumed = 0
+        self._emitted = 0
+
+    def _emit(self, end, dtype):
+        count = max(0, end - self._emitted)
+        out = _apply(self._buffer, self._emitted, count, self._spec, self._offset)
+        self._emitted += count
+        # 丢掉之后的输出不再需要的样本
+        keep = self._emitted * self.down // self.up - self._offset
+        self._buffer = self._buffer[keep:]
+        self._offset += keep
+        return _to_dtype(out, dtype)
+
+    def process(self, chunk):
+        """Resample a (frames, channels) chunk; returns the output frames that are complete"""
+        self._buffer = np.concatenate([self._buffer, chunk.astype(np.float64)])
+        self._consumed += len(chunk)
+        # 输出 m 需要补零序列中 [m*down//up, m*down//up + 2*half] 的样本
+        last = self._offset + len(self._buffer) - self.bank.shape[1]
+        end = ((last + 1) * self.up - 1) // self.down + 1 if last >= 0 else 0
+        return self._emit(end, chunk.dtype)
+
+    def flush(self, dtype=np.int16):
+        """Output frames that depend on the end of the signal"""
+        self._buffer = np.concatenate([self._buffer, np.zeros((self.half + 1, self.channels))])
+        return self._emit(_output_length(self._consumed, self.up, self.down), dtype)
@@ -0,0 +1,166 @@
+import contextlib
+import json
+import math
+import os
+import subprocess
+import tempfile
+import wave
+
+import numpy as np
+
+from .audio_resample import PolyphaseResampler
+
+# 约 1.5 秒的 44.1 kHz 音频；峰值内存只与它有关，与文件长度无关
+CHUNK_FRAMES = 65536
+STEREO = 2
+
+
+def probe(path):
+    """(sample_rate, channels) of the first audio stream, read with ffprobe"""
+    command = ["ffprobe", "-v", "error", "-select_streams", "a:0", "-show_entries", "stream=sample_rate,channels", "-of", "json", path]
+    result = subprocess.run(command, capture_output=True, check=False)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe failed on {path}: {result.stderr.decode(errors='replace').strip()}")
+    streams = json.loads(result.stdout).get("streams") or []
+    if not streams:
+        raise ValueError(f"No audio stream in {path}")
+    return int(streams[0]["sample_rate"]), int(streams[0]["channels"])
+
+
+def decode_chunks(path, channels, chunk_frames=CHUNK_FRAMES):
+    """Yield the decoded audio as int16 arrays of shape (frames, channels), ``chunk_frames`` at a time.
+
+    ffmpeg decodes to 16-bit PCM at the source rate and channel count, which is what
+    pydub asks ffmpeg for when loading an MP3.
+    """
+    command = ["ffmpeg", "-v", "error", "-nostdin", "-i", path, "-vn", "-f", "s16le", "-acodec", "pcm_s16le", "-"]
+    frame_bytes = 2 * channels
+    # 损坏的文件可能输出大量错误信息，stderr 写临时文件，避免管道写满后互相等待
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr)
+        try:
+            while data := process.stdout.read(chunk_frames * frame_bytes):
+                usable = len(data) - len(data) % frame_bytes
+                yield np.frombuffer(data[:usable], dtype="<i2").reshape(-1, channels)
+            if process.wait() != 0:
+                stderr.seek(0)
+                raise RuntimeError(f"ffmpeg failed on {path}: {stderr.read().decode(errors='replace').strip()}")
+        finally:
+            if process.poll() is None:
+                process.kill()
+            process.stdout.close()
+            process.wait()
+
+
+class LinearResampler:
+    """Streaming linear-interpolation resampler for int16 frames.
+
+    Produces the same samples as ``audioop.ratecv`` (what pydub's ``set_frame_rate``
+    uses) on the whole signal, however the input is split into chunks: the only state
+    carried between ``process`` calls is the frame counters and the last input frame.
+    """
+
+    def __init__(self, in_rate, out_rate, channels):
+        divisor = math.gcd(in_rate, out_rate)
+        self.up = out_rate // divisor
+        self.down = in_rate // divisor
+        self.channels = channels
+        self._consumed = 0
+        self._emitted = 0
+        self._last = np.zeros((1, channels), dtype=np.int64)
+
+    def process(self, chunk):
+        """Resample a (frames, channels) int16 chunk; returns the output frames it completes"""
+        consumed = self._consumed + len(chunk)
+        if not len(chunk):
+            return np.empty((0, self.channels), dtype=np.int16)
+        up, down = self.up, self.down
+        # 第 j 个输出帧在读入第 n_j = ceil(j*down/up) + 1 个输入帧后产生，位于 n_j-2 和 n_j-1 两帧之间
+        end = (consumed - 1) * up // down + 1
+        j = np.arange(self._emitted, end, dtype=np.int64)
+        n = -(-(j * down) // up) + 1
+        weight = ((n - 1) * up - j * down)[:, None]
+        frames = np.concatenate([self._last, chunk.astype(np.int64)])
+        index = n - self._consumed
+        previous, current = frames[index - 1], frames[index]
+        # 与 ratecv 相同的定点运算：样本放大到 32 位，除法向零取整，再算术右移回 16 位
+        value = (previous * weight + current * (up - weight)) << 16
+        value = np.where(value >= 0, value // up, -(-value // up)) >> 16
+        self._consumed = consumed
+        self._emitted = end
+        self._last = frames[-1:]
+        return value.astype(np.int16)
+
+    def flush(self):
+        """Nothing is held back: every output frame is emitted as soon as its input arrives"""
+        return np.empty((0, self.channels), dtype=np.int16)
+
+
+RESAMPLERS = ("linear", "polyphase")
+
+
+def make_resampler(kind, in_rate, out_rate, channels, quality="default"):  # noqa: PLR0913, PLR0917
+    """``"linear"`` matches pydub byte for byte, ``"polyphase"`` is a proper anti-aliasing filter"""
+    if kind == "linear":
+        return LinearResampler(in_rate, out_rate, channels)
+    if kind == "polyphase":
+        return PolyphaseResampler(in_rate, out_rate, channels, quality)
+    raise ValueError(f"Unknown resampler {kind!r}, expected one of {RESAMPLERS}")
+
+
+def remix(chunk, channels):
+    """Change the channel count the way pydub's ``set_channels`` does"""
+    source = chunk.shape[1]
+    if source == channels:
+        return chunk
+    if channels == 1 and source == STEREO:
+        # audioop.tomono(..., 0.5, 0.5)：向下取整的平均
+        return ((chunk[:, 0].astype(np.int32) + chunk[:, 1]) >> 1).astype(np.int16)[:, None]
+    if channels == 1:
+        return (chunk.astype(np.int32) // source).sum(axis=1, dtype=np.int32).astype(np.int16)[:, None]
+    if source == 1:
+        return np.repeat(chunk, channels, axis=1)
+    raise ValueError(f"Cannot convert {source} channels to {channels}, only mono to multi channel and multi channel to mono are supported")
+
+
+def _write(out, chunk, channels):
+    mixed = remix(chunk, channels)
+    out.writeframesraw(mixed.astype("<i2", copy=False).tobytes())
+    return len(mixed)
+
+
+def convert_chunks(chunks, sample_rate, channels, wav_path, target_sample_rate=16000, target_num_channels=1, *, resampler="linear", quality="default") -> int:  # noqa: PLR0913, PLR0917
+    """Resample, remix and append int16 chunks to a WAV file; returns the number of frames written.
+
+    The ``wave`` module writes a placeholder header first and patches the sizes in when
+    the file is closed, so nothing but the current chunk is held in memory.
+    """
+    resampler = make_resampler(resampler, sample_rate, target_sample_rate, channels, quality) if sample_rate != target_sample_rate else None
+    frames = 0
+    try:
+        with wave.open(wav_path, "wb") as out:
+            out.setnchannels(target_num_channels)
+            out.setsampwidth(2)
+            out.setframerate(target_sample_rate)
+            for chunk in chunks:
+                # 与 pydub 的顺序一致：先改采样率再改声道数
+                resampled = resampler.process(chunk) if resampler is not None else chunk
+                frames += _write(out, resampled, target_num_channels)
+            if resampler is not None:
+                frames += _write(out, resampler.flush(), target_num_channels)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(wav_path)
+        raise
+    return frames
+
+
+def stream_convert(mp3_path, wav_path, target_sample_rate=16000, target_num_channels=1, chunk_frames=CHUNK_FRAMES, *, resampler="linear", quality="default") -> int:  # noqa: PLR0913
+    """Convert an MP3 to WAV in constant memory.
+
+    With the default ``"linear"`` resampler the output matches ``convert_mp3_to_wav``;
+    ``"polyphase"`` filters out aliasing at the given ``quality``, see ``audio_resample``.
+    """
+    sample_rate, channels = probe(mp3_path)
+    chunks = decode_chunks(mp3_path, channels, chunk_frames)
+    return convert_chunks(chunks, sample_rate, channels, wav_path, target_sample_rate, target_num_channels, resampler=resampler, quality=quality)
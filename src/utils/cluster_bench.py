@@ -0,0 +1,194 @@
+import asyncio
+import hashlib
+import json
+import os
+import platform
+import time
+import warnings
+from datetime import UTC, datetime
+
+import click
+from loguru import logger
+
+from .config import Config
+
+# 指标名 -> 是否越大越好
+METRICS = {
+    "cold_start_s": False,
+    "tiny_tasks_per_s": True,
+    "cpu_tasks_per_s": True,
+    "gil_release_tasks_per_s": True,
+    "serialization_mb_per_s": True,
+    "shutdown_s": False,
+}
+
+
+def _noop(x):
+    return x
+
+
+def _cpu_task(n):
+    # 纯 Python 循环，全程持有 GIL
+    total = 0
+    for i in range(n):
+        total += i * i
+    return total
+
+
+def _gil_release_task(size, rounds):
+    # hashlib 处理大块数据时会释放 GIL
+    data = b"\0" * size
+    digest = b""
+    for _ in range(rounds):
+        digest = hashlib.sha256(data).digest()
+    return digest
+
+
+def _payload_size(payload):
+    return payload.nbytes
+
+
+def parse_grid(text):
+    """Parse "2x1,4x1,2x2" into [(n_workers, threads_per_worker), ...]"""
+    grid = []
+    for item in text.split(","):
+        workers, _, threads = item.strip().partition("x")
+        grid.append((int(workers), int(threads or 1)))
+    return grid
+
+
+def _rate(client, func, args, **kwargs):
+    start = time.perf_counter()
+    client.gather(client.map(func, args, pure=False, **kwargs))
+    return len(args) / (time.perf_counter() - start)
+
+
+def bench_config(n_workers, threads_per_worker, *, tiny_tasks=2000, cpu_tasks=None, payload_mb=64):
+    """Start the singleton with one grid point and measure it; returns a result dict"""
+    import numpy as np  # noqa: PLC0415
+
+    from .dask import DaskClientSingleton  # noqa: PLC0415
+
+    total_threads = n_workers * threads_per_worker
+    cpu_tasks = cpu_tasks or total_threads * 8
+
+    DaskClientSingleton.set_overrides(n_workers=n_workers, threads_per_worker=threads_per_worker, scheduler_port=0, dashboard_address=None)
+    try:
+        start = time.perf_counter()
+        client = DaskClientSingleton().get_client()
+        client.wait_for_workers(n_workers, timeout=300)
+        result = {"n_workers": n_workers, "threads_per_worker": threads_per_worker, "cold_start_s": time.perf_counter() - start}
+
+        # 预热：让每个 worker 导入本模块，避免首批任务计入导入耗时
+        client.gather(client.map(_noop, range(total_threads * 2), pure=False))
+
+        result["tiny_tasks_per_s"] = _rate(client, _noop, list(range(tiny_tasks)))
+        result["cpu_tasks_per_s"] = _rate(client, _cpu_task, [200_000] * cpu_tasks)
+        result["gil_release_tasks_per_s"] = _rate(client, _gil_release_task, [8 * 2**20] * cpu_tasks, rounds=4)
+
+        payload = np.ones(payload_mb * 2**20, dtype=np.uint8)
+        with warnings.catch_warnings():
+            # 这里就是要测量大参数直接放进任务图的代价
+            warnings.simplefilter("ignore")
+            start = time.perf_counter()
+            for _ in range(3):
+                client.submit(_payload_size, payload, pure=False).result()
+        result["serialization_mb_per_s"] = 3 * payload_mb / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        asyncio.run(DaskClientSingleton.close(keep_warm=False))
+        result["shutdown_s"] = time.perf_counter() - start
+        return result
+    finally:
+        DaskClientSingleton.set_overrides()
+        if DaskClientSingleton._client is not None:
+            asyncio.run(DaskClientSingleton.close(keep_warm=False))
+
+
+def compare(results, baseline, threshold):
+    """Return (lines, regressions) comparing results with a baseline document"""
+    previous = {(r["n_workers"], r["threads_per_worker"]): r for r in baseline.get("results", [])}
+    lines, regressions = [], []
+    for result in results:
+        config = (result["n_workers"], result["threads_per_worker"])
+        old = previous.get(config)
+        if old is None:
+            lines.append(f"{config[0]}x{config[1]}: not in baseline")
+            continue
+        for metric, higher_is_better in METRICS.items():
+            if not old.get(metric):
+                continue
+            change = (result[metric] - old[metric]) / old[metric]
+            worse = -change if higher_is_better else change
+            marker = "REGRESSION" if worse > threshold else ("better" if -worse > threshold else "")
+            lines.append(f"{config[0]}x{config[1]} {metric:<24} {old[metric]:>12.3f} -> {result[metric]:>12.3f} ({change:+.1%}) {marker}".rstrip())
+            if marker == "REGRESSION":
+                regressions.append((config, metric, change))
+    return lines, regressions
+
+
+def _default_grid(cluster_config):
+    workers = cluster_config.get("n_workers", 4)
+    threads = cluster_config.get("threads_per_worker", 2)
+    cpus = os.cpu_count() or 1
+    grid = {(workers, threads), (cpus, 1), (max(1, cpus // 2), 2), (1, cpus)}
+    return sorted(grid)
+
+
+@click.command("bench")
+@click.option("--grid", help='Configurations as "WORKERSxTHREADS,...", default: config.yaml plus a few around the CPU count')
+@click.option("--output", type=click.Path(dir_okay=False), help="Result file, default: <outputs>/cluster-bench.json")
+@click.option("--baseline", type=click.Path(dir_okay=False), help="Saved result to compare against")
+@click.option("--save-baseline", is_flag=True, help="Also write the result to --baseline")
+@click.option("--threshold", type=float, default=0.1, show_default=True, help="Relative change reported as regression/improvement")
+@click.option("--tiny-tasks", type=int, default=2000, show_default=True)
+@click.option("--payload-mb", type=int, default=64, show_default=True)
+@click.option("--fail-on-regression", is_flag=True, help="Exit with status 1 if any metric regressed")
+def bench_command(grid, output, baseline, save_baseline, threshold, tiny_tasks, payload_mb, fail_on_regression):  # noqa: PLR0913, PLR0917
+    """Benchmark DaskClientSingleton over a grid of n_workers x threads_per_worker."""
+    config = Config().get_config()
+    cluster_config = config["cluster"]
+    if (cluster_config.get("adaptive") or {}).get("enabled"):
+        logger.warning("cluster.adaptive is enabled, worker counts will drift during the benchmark")
+    configs = parse_grid(grid) if grid else _default_grid(cluster_config)
+    output = output or os.path.join(config.get("outputs", "./outputs"), "cluster-bench.json")
+
+    results = []
+    for n_workers, threads_per_worker in configs:
+        click.echo(f"Benchmarking {n_workers} workers x {threads_per_worker} threads ...")
+        result = bench_config(n_workers, threads_per_worker, tiny_tasks=tiny_tasks, payload_mb=payload_mb)
+        results.append(result)
+        click.echo("  " + ", ".join(f"{metric}={result[metric]:.3f}" for metric in METRICS))
+
+    document = {
+        "created": datetime.now(UTC).isoformat(),
+        "host": {"platform": platform.platform(), "python": platform.python_version(), "cpu_count": os.cpu_count()},
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+    click.echo(f"Results written to {output}")
+
+    for metric, higher_is_better in METRICS.items():
+        best = (max if higher_is_better else min)(results, key=lambda r, metric=metric: r[metric])
+        click.echo(f"best {metric:<24} {best['n_workers']}x{best['threads_per_worker']} ({best[metric]:.3f})")
+
+    regressions = []
+    if baseline and os.path.exists(baseline) and not save_baseline:
+        with open(baseline, encoding="utf-8") as f:
+            lines, regressions = compare(results, json.load(f), threshold)
+        click.echo(f"Compared with {baseline}:")
+        for line in lines:
+            click.echo(f"  {line}")
+    if baseline and save_baseline:
+        with open(baseline, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2)
+        click.echo(f"Baseline saved to {baseline}")
+
+    if regressions and fail_on_regression:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    bench_command()
@@ -1,13 +1,192 @@
+import getpass
+import hashlib
+import keyword
+import marshal
 import os
+import tempfile
+from collections.abc import Mapping
+from types import MappingProxyType
 
-import yaml
 from loguru import logger
 
+from .config_watch import FileWatcher
+
+_SNAPSHOT_VERSION = 1
+
+
+class ConfigSection(Mapping):
+    """Immutable view of one mapping in the config.
+
+    Every identifier-like key is also a slot on a class generated per key set, so
+    ``config.cluster.n_workers`` is a plain slot read. Item access and ``get`` keep
+    working for callers that treat the config as a dict.
+    """
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data):
+        object.__setattr__(self, "_data", MappingProxyType(data))
+        for key in type(self).__slots__:
+            object.__setattr__(self, key, data[key])
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self._data)!r})"
+
+    def __reduce__(self):
+        # 动态生成的子类无法按名字 pickle，改为按原始数据重建
+        return freeze, (self.to_dict(),)
+
+    def to_dict(self) -> dict:
+        """Return a mutable deep copy as plain dicts and lists"""
+        return _thaw(self)
+
+
+_section_types = {}
+
+
+def _section_type(keys):
+    # 与 Mapping 方法同名的键（如 items、get）只能通过下标访问
+    fields = tuple(k for k in keys if isinstance(k, str) and k.isidentifier() and not keyword.iskeyword(k) and not k.startswith("_") and not hasattr(ConfigSection, k))
+    section_type = _section_types.get(fields)
+    if section_type is None:
+        section_type = type("ConfigSection", (ConfigSection,), {"__slots__": fields})
+        _section_types[fields] = section_type
+    return section_type
+
+
+def freeze(value):
+    """Convert parsed YAML into nested ConfigSection objects and tuples"""
+    if isinstance(value, Mapping):
+        data = {k: freeze(v) for k, v in value.items()}
+        return _section_type(data)(data)
+    if isinstance(value, list | tuple):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def _thaw(value):
+    if isinstance(value, Mapping):
+        return {k: _thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(v) for v in value]
+    return value
+
+
+def diff_config(old, new, prefix=""):
+    """Return the sorted dotted paths whose values differ between two configs"""
+    if not (isinstance(old, Mapping) and isinstance(new, Mapping)):
+        return [prefix] if old != new else []
+    changed = []
+    for key in old.keys() | new.keys():
+        path = f"{prefix}.{key}" if prefix else str(key)
+        if key not in old or key not in new:
+            changed.append(path)
+        else:
+            changed.extend(diff_config(old[key], new[key], path))
+    return sorted(changed)
+
+
+class ConfigChange:
+    """Event published to Config subscribers after the file was reloaded"""
+
+    __slots__ = ("old", "new", "changed")
+
+    def __init__(self, old, new, changed):
+        self.old = old
+        self.new = new
+        self.changed = tuple(changed)
+
+    def touches(self, *prefixes) -> bool:
+        """True if any changed path equals or lies below one of the dotted prefixes"""
+        return any(path == prefix or path.startswith(prefix + ".") for path in self.changed for prefix in prefixes)
+
+
+def _cache_owner():
+    try:
+        return getpass.getuser()
+    except (KeyError, OSError):
+        # 容器里的 uid 常常没有 passwd 条目：3.13 之前抛 KeyError，之后抛 OSError
+        if not hasattr(os, "getuid"):
+            # Windows 上没有 uid，调用方遇到 OSError 会跳过快照
+            raise OSError("Cannot determine the current user for the config snapshot") from None
+        return str(os.getuid())
+
+
+def _snapshot_path(config_file):
+    # 每个用户一个目录，权限 0700，避免读取他人写入的快照
+    cache_dir = os.path.join(tempfile.gettempdir(), f"py-project-template-{_cache_owner()}")
+    os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+    digest = hashlib.sha1(config_file.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, f"config-{digest}.snapshot")
+
+
+def load_config_file(config_file):
+    """Parse a YAML config, reusing a binary snapshot while the file is unchanged.
+
+    The snapshot is keyed by absolute path, mtime and size and stored with ``marshal``,
+    which is faster than YAML parsing and cannot execute code on load. Configs holding
+    values marshal does not support (e.g. timestamps) are simply not cached.
+    """
+    config_file = os.path.abspath(config_file)
+    stat = os.stat(config_file)
+    key = (_SNAPSHOT_VERSION, config_file, stat.st_mtime_ns, stat.st_size)
+
+    try:
+        snapshot_path = _snapshot_path(config_file)
+    except OSError:
+        snapshot_path = None
+
+    if snapshot_path is not None:
+        try:
+            with open(snapshot_path, "rb") as f:
+                cached_key, data = marshal.load(f)
+            if tuple(cached_key) == key:
+                logger.debug(f"Config loaded from snapshot {snapshot_path}")
+                return data
+        except (OSError, EOFError, ValueError, TypeError):
+            # 快照不存在或已损坏，重新解析后覆盖
+            pass
+
+    # 命中快照时连 yaml 都不需要导入
+    import yaml  # noqa: PLC0415
+
+    with open(config_file, encoding="utf-8") as f:
+        # 有 libyaml 时使用 C 实现的解析器
+        data = yaml.load(f, Loader=getattr(yaml, "CFullLoader", yaml.FullLoader))
+
+    if snapshot_path is not None:
+        try:
+            payload = marshal.dumps((key, data))
+            tmp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, snapshot_path)
+        except (OSError, ValueError) as e:
+            logger.debug(f"Config snapshot not written: {e}")
+    return data
+
 
 class Config:
     _instance = None
     _config = None
     _initialized = False
+    _subscribers = []
+    _watcher = None
 
     def __new__(cls):
         if cls._instance is None:
@@ -17,6 +196,7 @@ class Config:
     def __init__(self):
         # Only initialize once
         if not Config._initialized:
+            config_file = None
             try:
                 current_dir = os.getcwd()
                 logger.debug(f"Current dir: {current_dir}, Loading config file...")
@@ -33,16 +213,65 @@ class Config:
 
                 logger.debug(f"Using config file path: {config_file}")
 
-                with open(config_file, encoding="utf-8") as f:
-                    config = yaml.load(f, Loader=yaml.FullLoader)
-                    self.__config = config
-                    f.close()
+                self.__config_file = os.path.abspath(config_file)
+                self.__config = freeze(load_config_file(config_file))
 
-                logger.debug(f"Config loaded: {self.__config}")
                 Config._initialized = True
             except Exception as e:
                 logger.error(f"Error loading config file '{config_file}': {e}", exc_info=True)
                 raise
 
     def get_config(self):
+        """Return the parsed config as an immutable ConfigSection.
+
+        Reloading swaps the whole object, so readers never need a lock: keep the
+        returned reference for a consistent view, call again to see later changes.
+        """
         return self.__config
+
+    @classmethod
+    def subscribe(cls, callback):
+        """Call callback(ConfigChange) after every reload that changed something"""
+        if callback not in cls._subscribers:
+            cls._subscribers.append(callback)
+
+    @classmethod
+    def unsubscribe(cls, callback):
+        if callback in cls._subscribers:
+            cls._subscribers.remove(callback)
+
+    def reload(self):
+        """Re-read the config file, swap in the new config and publish the diff"""
+        try:
+            new = freeze(load_config_file(self.__config_file))
+        except Exception as e:
+            # 写到一半或格式错误时保留旧配置，等下一次修改
+            logger.error(f"Error reloading config file '{self.__config_file}': {e}")
+            return None
+
+        old = self.__config
+        changed = diff_config(old, new)
+        if not changed:
+            return None
+
+        self.__config = new
+        change = ConfigChange(old, new, changed)
+        logger.info(f"Config reloaded, changed: {', '.join(changed)}")
+        for callback in list(self._subscribers):
+            try:
+                callback(change)
+            except Exception as e:
+                logger.error(f"Error applying config change in {callback!r}: {e}")
+        return change
+
+    def watch(self, poll_interval=1.0):
+        """Start reloading the config whenever its file changes (inotify, or polling)"""
+        if Config._watcher is None:
+            Config._watcher = FileWatcher(self.__config_file, self.reload, poll_interval=poll_interval).start()
+        return Config._watcher
+
+    @classmethod
+    def stop_watching(cls):
+        if cls._watcher is not None:
+            cls._watcher.stop()
+            cls._watcher = None
@@ -0,0 +1,112 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+
+from loguru import logger
+
+# <sys/inotify.h>
+_IN_CREATE = 0x100
+_IN_CLOSE_WRITE = 0x8
+_IN_MOVED_TO = 0x80
+_IN_EVENT = struct.Struct("iIII")
+
+
+def _load_inotify():
+    """Return (libc, fd) for a non-blocking inotify instance, or None where unsupported"""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    return libc, fd
+
+
+class FileWatcher:
+    """Call ``callback()`` from a daemon thread whenever ``path`` changes.
+
+    Uses inotify on the parent directory where available, which also catches editors
+    that save by writing a temp file and renaming it over the original, and falls back
+    to polling ``os.stat`` every ``poll_interval`` seconds elsewhere. Change detection
+    always compares mtime and size, so spurious events do not trigger the callback.
+    """
+
+    def __init__(self, path, callback, poll_interval=1.0):
+        self.path = os.path.abspath(path)
+        self._callback = callback
+        self._poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._signature = self._stat()
+        self._thread = None
+        self.mode = None
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _check(self):
+        signature = self._stat()
+        if signature is None or signature == self._signature:
+            return
+        self._signature = signature
+        try:
+            self._callback()
+        except Exception as e:
+            logger.error(f"Error handling change of {self.path}: {e}")
+
+    def start(self):
+        inotify = _load_inotify()
+        if inotify is not None:
+            libc, fd = inotify
+            wd = libc.inotify_add_watch(fd, os.path.dirname(self.path).encode(), _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE)
+            if wd < 0:
+                os.close(fd)
+                inotify = None
+        self.mode = "inotify" if inotify is not None else "poll"
+        target = self._run_inotify if inotify is not None else self._run_poll
+        args = (inotify[1],) if inotify is not None else ()
+        self._thread = threading.Thread(target=target, args=args, name="config-watcher", daemon=True)
+        self._thread.start()
+        logger.debug(f"Watching {self.path} ({self.mode})")
+        return self
+
+    def _run_poll(self):
+        while not self._stop.wait(self._poll_interval):
+            self._check()
+
+    def _run_inotify(self, fd):
+        name = os.path.basename(self.path).encode()
+        try:
+            while not self._stop.is_set():
+                ready, _, _ = select.select([fd], [], [], self._poll_interval)
+                if not ready:
+                    continue
+                try:
+                    data = os.read(fd, 64 * 1024)
+                except BlockingIOError:
+                    continue
+                offset, touched = 0, False
+                while offset + _IN_EVENT.size <= len(data):
+                    _, _, _, length = _IN_EVENT.unpack_from(data, offset)
+                    offset += _IN_EVENT.size
+                    touched |= data[offset : offset + length].rstrip(b"\0") == name
+                    offset += length
+                if touched:
+                    self._check()
+        finally:
+            os.close(fd)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -1,9 +1,17 @@
+import atexit
 import logging
 import os.path
+import re
 import sys
+import threading
 
 from loguru import logger
 
+from .log_sampling import LogSampler
+from .log_scope import get_context, install_log_context
+from .log_sink import BatchingSink, RotatingFile, StreamTarget
+from .log_store import StructuredLogSink
+
 loglevel_mapping = {
     50: "CRITICAL",
     40: "ERROR",
@@ -14,46 +22,67 @@ loglevel_mapping = {
 }
 
 
-class InterceptHandler(logging.Handler):
-    def emit(self, record):
-        try:
-            level = logger.level(record.levelname).name
-        except AttributeError:
-            level = loglevel_mapping[record.levelno]
+# 标记当前线程正在经由 InterceptHandler 转发 stdlib 记录，这些记录已按 stdlib 各自的级别筛过
+_bridging = threading.local()
 
-        frame, depth = logging.currentframe(), 2
-        while frame.f_code.co_filename == logging.__file__:
-            frame = frame.f_back
-            depth += 1
 
-        log = logger.bind(request_id="app")
-        log.opt(depth=depth, exception=record.exc_info).log(level, record.getMessage())
+class InterceptHandler(logging.Handler):
+    """Bridge stdlib logging records into loguru.
 
+    Disabled levels never reach ``emit``: the root logger carries the loguru threshold
+    and loggers listed in ``log.stdlib_levels`` their own level (see
+    ``CustomizeLogger.intercept_stdlib``), so ``isEnabledFor`` rejects them before a
+    ``LogRecord`` is even built. For the records that do pass, the loguru level and
+    the caller depth are cached per level name / call site.
+    """
 
-class MyInterceptor(logging.Handler):
-    def handle(self, record):
-        # 修改日志级别
-        record.level = logging.WARNING
+    def __init__(self, level=logging.NOTSET):
+        super().__init__(level)
+        self._levels = {}
+        self._depths = {}
 
-        # 添加自定义元数据
-        # record.extra['my_custom_metadata'] = 'hello, world!'
+    def emit(self, record):
+        try:
+            level = self._levels[record.levelname]
+        except KeyError:
+            level = self._resolve_level(record)
 
-        # 继续记录日志
-        super().handle(record)
+        # 没有请求上下文时沿用 "app"，否则由日志上下文补上 request_id
+        log = logger if get_context().get("request_id") is not None else logger.bind(request_id="app")
+        _bridging.active = True
+        try:
+            log.opt(depth=self._call_depth(record), exception=record.exc_info).log(level, record.getMessage())
+        finally:
+            _bridging.active = False
 
-    def emit(self, record):
+    def _resolve_level(self, record):
         try:
             level = logger.level(record.levelname).name
-        except AttributeError:
-            level = loglevel_mapping[record.levelno]
-
-        frame, depth = logging.currentframe(), 2
-        while frame.f_code.co_filename == logging.__file__:
+        except ValueError:
+            level = loglevel_mapping.get(record.levelno, record.levelno)
+        self._levels[record.levelname] = level
+        return level
+
+    def _call_depth(self, record):
+        """Return the loguru depth of the frame that issued the stdlib call"""
+        site = (record.pathname, record.lineno)
+        depth = self._depths.get(site)
+        if depth is not None:
+            # 同一调用点经过的 logging 栈通常不变，只需确认缓存的深度仍指向调用者
+            try:
+                frame = sys._getframe(depth + 1)
+            except ValueError:
+                frame = None
+            if frame is not None and frame.f_lineno == record.lineno and frame.f_code.co_filename == record.pathname:
+                return depth
+
+        # 从 emit 的调用者开始，跳过 logging 模块内部的栈帧
+        frame, depth = sys._getframe(2), 1
+        while frame is not None and frame.f_code.co_filename == logging.__file__:
             frame = frame.f_back
             depth += 1
-
-        log = logger.bind(request_id="app")
-        log.opt(depth=depth, exception=record.exc_info).log(level, record.getMessage())
+        self._depths[site] = depth
+        return depth
 
 
 class ModuleFilter:
@@ -125,6 +154,131 @@ class SourceFilter:
             return True
 
 
+class _ModuleTrie:
+    """Prefix trie over dotted module components"""
+
+    __slots__ = ("_root",)
+
+    def __init__(self, modules):
+        self._root = {}
+        for module in modules:
+            node = self._root
+            for part in module.split("."):
+                node = node.setdefault(part, {})
+            # None 作为终止标记，表示该前缀本身被排除
+            node[None] = True
+
+    def match(self, module_path: str) -> bool:
+        """Return True if module_path equals an excluded module or lives below one"""
+        node = self._root
+        for part in module_path.split("."):
+            node = node.get(part)
+            if node is None:
+                return False
+            if None in node:
+                return True
+        return False
+
+
+def _compile_substrings(patterns):
+    """Compile substrings into a single alternation so one C-level scan checks them all"""
+    if not patterns:
+        return None
+    # 长的模式放前面，避免同前缀的短模式抢先匹配（对结果无影响，但让匹配更早结束）
+    ordered = sorted(set(patterns), key=len, reverse=True)
+    return re.compile("|".join(re.escape(p) for p in ordered))
+
+
+class CompiledFilter:
+    """Single-pass replacement for SourceFilter/ModuleFilter/MessageFilter/LoggerNameFilter.
+
+    Lookup structures are built once in ``compile`` and swapped atomically, so the
+    same instance can stay attached to every sink while the exclusion lists change.
+    The verdict for the last record is memoized per thread: loguru hands the same
+    record dict to every handler, one after another in the logging thread, so the
+    stdout and file sinks share one evaluation even when threads log concurrently.
+    Records that pass the exclusion lists are finally offered to the optional
+    ``LogSampler``, which therefore counts each record exactly once.
+    """
+
+    __slots__ = ("_tables", "_sampler", "_last", "_levelno")
+
+    _LEGACY_CUSTOM_LOGGING = "src.g1_task.utils.custom_logging"
+
+    def __init__(self, sources=(), modules=(), patterns=(), loggers=()):
+        self._tables = None
+        self._sampler = None
+        self._levelno = 0
+        # 每个线程最近一条记录及其结论；不写在记录上，enqueue 的 sink 会把记录 pickle 到队列里
+        self._last = threading.local()
+        self.compile(sources, modules, patterns, loggers)
+
+    def compile(self, sources=(), modules=(), patterns=(), loggers=()):
+        """Rebuild the lookup tables from the exclusion lists"""
+        pairs = set()
+        legacy_functions = set()
+        for source in sources:
+            if ":" in source:
+                module, function = source.split(":", 1)
+                pairs.add((module, function))
+                if module == self._LEGACY_CUSTOM_LOGGING:
+                    legacy_functions.add(function)
+
+        tables = (
+            frozenset(pairs),
+            frozenset(legacy_functions),
+            _ModuleTrie(modules) if modules else None,
+            _compile_substrings(patterns),
+            _compile_substrings(loggers),
+        )
+        self._tables = tables if any(tables) else None
+
+    def set_sampler(self, sampler):
+        """Attach a LogSampler (or None) consulted after the exclusion lists"""
+        self._sampler = sampler
+
+    def set_level(self, levelno: int):
+        """Minimum level for records not bridged from stdlib logging"""
+        self._levelno = levelno
+
+    def __call__(self, record):
+        # sink 的级别可能因 stdlib_levels 放低到 log.level 以下，那部分只留给 stdlib 转发来的记录
+        if record["level"].no < self._levelno and not getattr(_bridging, "active", False):
+            return False
+        last = self._last
+        if getattr(last, "record", None) is record:
+            return last.verdict
+
+        verdict = self._judge(record)
+        if verdict and self._sampler is not None:
+            verdict = self._sampler.allow(record)
+        last.record, last.verdict = record, verdict
+        return verdict
+
+    def _judge(self, record):
+        tables = self._tables
+        if tables is None:
+            return True
+
+        pairs, legacy_functions, module_trie, message_re, logger_re = tables
+        name = record["name"] or ""
+
+        if pairs:
+            function = record["function"]
+            if (name, function) in pairs:
+                return False
+            if function in legacy_functions and "custom_logging" in name:
+                return False
+
+        if module_trie is not None and module_trie.match(name):
+            return False
+
+        if message_re is not None and message_re.search(record["message"]):
+            return False
+
+        return logger_re is None or logger_re.search(name) is None
+
+
 class CustomizeLogger:
     __mqtt_client = None
 
@@ -152,6 +306,25 @@ class CustomizeLogger:
         # "loggingCallHandlers",
     ]
 
+    # 由以上排除列表编译而成，set_excluded_* 修改列表后会重新编译
+    __record_filter = CompiledFilter()
+
+    # 批量写入模式下的 sink，名称 -> BatchingSink
+    __batching_sinks = {}
+
+    # 按调用点采样/限流，未配置时为 None
+    __sampler = None
+
+    # 当前 sink 的 handler id，重建时先加新的再删旧的；None 表示还没有配置过
+    __handler_ids = None
+
+    # 当前 sink 的级别：log.level 与 stdlib_levels 中的最低者
+    __sink_levelno = None
+
+    # 这些配置项变化后需要重建 sink，其余的可以原地生效。
+    # level 留在 sink 上，loguru 才能在构造记录之前就丢弃低于阈值的调用，因此改 level 也要换一批 sink
+    __sink_settings = ("level", "format", "path", "filename", "rotation", "retention", "batching", "structured")
+
     @classmethod
     def make_logger(cls, config):
         filename = config["filename"]
@@ -167,13 +340,34 @@ class CustomizeLogger:
             retention=config["retention"],
             rotation=config["rotation"],
             format=config["format"],
+            batching=config.get("batching"),
+            structured=config.get("structured"),
+            stdlib_levels=config.get("stdlib_levels"),
         )
+        cls.set_stdlib_levels(config.get("stdlib_levels"))
+        cls.set_sampling(config.get("sampling"))
         return logger
 
+    @classmethod
+    def apply_config_change(cls, change):
+        """Re-apply the ``log`` section after a config reload (a Config subscriber)"""
+        if not change.touches("log"):
+            return
+        log_config = change.new["log"]
+        if change.touches(*(f"log.{key}" for key in cls.__sink_settings)) or cls._sink_levelno(log_config["level"], log_config.get("stdlib_levels")) != cls.__sink_levelno:
+            # 重建 sink 时会一并应用 stdlib_levels 和 sampling
+            cls.make_logger(log_config)
+            return
+        if change.touches("log.stdlib_levels"):
+            cls.set_stdlib_levels(log_config.get("stdlib_levels"))
+        if change.touches("log.sampling"):
+            cls.set_sampling(log_config.get("sampling"))
+
     @classmethod
     def set_excluded_modules(cls, modules: list):
         """Set modules to exclude from logging"""
         cls.__excluded_modules = modules
+        cls._compile_filter()
 
     @classmethod
     def get_excluded_modules(cls) -> list:
@@ -184,6 +378,7 @@ class CustomizeLogger:
     def set_excluded_patterns(cls, patterns: list):
         """Set message patterns to exclude from logging"""
         cls.__excluded_patterns = patterns
+        cls._compile_filter()
 
     @classmethod
     def get_excluded_patterns(cls) -> list:
@@ -194,6 +389,7 @@ class CustomizeLogger:
     def set_excluded_loggers(cls, loggers: list):
         """Set logger names to exclude from logging"""
         cls.__excluded_loggers = loggers
+        cls._compile_filter()
 
     @classmethod
     def get_excluded_loggers(cls) -> list:
@@ -210,37 +406,83 @@ class CustomizeLogger:
         """Get the list of excluded function names"""
         return cls.__excluded_functions
 
-    @classmethod
-    def customize_logging(cls, filepath: str, level: str, rotation: str, retention: str, format: str):
-        logger.remove()
-
-        # Create filters
-        filters = []
-
-        # 优先添加源过滤器，这是过滤第三方日志的主要方式
-        if cls.__excluded_sources:
-            filters.append(SourceFilter(cls.__excluded_sources))
-
-        # 如果需要其他过滤器，可以启用以下代码
-        # Add module filter if excluded modules are specified
-        if cls.__excluded_modules:
-            filters.append(ModuleFilter(cls.__excluded_modules))
+    @staticmethod
+    def _sink_levelno(level: str, stdlib_levels: dict | None) -> int:
+        """Level the sinks need: ``level``, or lower if a stdlib logger is allowed below it"""
+        return min(logger.level(str(value).upper()).no for value in (level, *(stdlib_levels or {}).values()))
 
-        # Add message filter if excluded patterns are specified
-        if cls.__excluded_patterns:
-            filters.append(MessageFilter(cls.__excluded_patterns))
+    @classmethod
+    def set_sampling(cls, config: dict | None):
+        """Configure per-call-site sampling from the ``log.sampling`` section, None disables it"""
+        if cls.__sampler is not None:
+            atexit.unregister(cls.__sampler.stop)
+            cls.__sampler.stop()
+            cls.__sampler = None
+        if config and config.get("enabled"):
+            cls.__sampler = LogSampler(
+                rules=config.get("rules"),
+                default=config.get("default"),
+                summary_interval=config.get("summary_interval", 60),
+            )
+            # 先于 loguru 自身的 atexit 执行，确保最后一个周期的汇总能写出
+            atexit.register(cls.__sampler.stop)
+        cls.__record_filter.set_sampler(cls.__sampler)
 
-        # Add logger name filter if excluded loggers are specified
-        if cls.__excluded_loggers:
-            filters.append(LoggerNameFilter(cls.__excluded_loggers))
+    @classmethod
+    def get_sink_stats(cls) -> dict:
+        """Get write/drop counters of the batched sinks, keyed by sink name"""
+        return {name: sink.stats for name, sink in cls.__batching_sinks.items()}
 
-        # Combine all filters
-        def combined_filter(record):
-            return all(f(record) for f in filters) if filters else True
+    @classmethod
+    def _compile_filter(cls):
+        """Rebuild the shared record filter from the current exclusion lists"""
+        cls.__record_filter.compile(
+            sources=cls.__excluded_sources,
+            modules=cls.__excluded_modules,
+            patterns=cls.__excluded_patterns,
+            loggers=cls.__excluded_loggers,
+        )
 
-        # Add handlers with the combined filter
-        logger.add(sys.stdout, enqueue=True, backtrace=True, level=level.upper(), format=format, filter=combined_filter if filters else None)
-        logger.add(filepath, rotation=rotation, retention=retention, enqueue=True, backtrace=True, level=level.upper(), format=format, filter=combined_filter if filters else None)
+    @classmethod
+    def customize_logging(cls, filepath: str, level: str, rotation: str, retention: str, format: str, *, batching: dict | None = None, structured: dict | None = None, stdlib_levels: dict | None = None):  # noqa: PLR0913
+        previous = cls.__handler_ids
+        if previous is None:
+            # 首次配置：去掉 loguru 默认的 stderr sink
+            logger.remove()
+
+        # 所有 sink 共用同一个编译后的过滤器，每条记录只判定一次
+        cls._compile_filter()
+        record_filter = cls.__record_filter
+        record_filter.set_level(logger.level(level.upper()).no)
+        # 通常就是 log.level；只有 stdlib_levels 放低某个库时 sink 才随之放低，由过滤器挡住其余低级别记录
+        levelno = cls._sink_levelno(level, stdlib_levels)
+
+        # Add handlers with the shared filter
+        if batching and batching.get("enabled"):
+            # 有界环形缓冲 + 后台批量写入，替代 enqueue 的无界多进程队列
+            options = {key: batching[key] for key in ("capacity", "batch_size", "flush_interval", "policy") if key in batching}
+            stdout_sink = BatchingSink(StreamTarget(sys.stdout), **options)
+            file_sink = BatchingSink(RotatingFile(filepath, rotation=rotation, retention=retention), **options)
+            cls.__batching_sinks = {"stdout": stdout_sink, "file": file_sink}
+            handler_ids = [
+                logger.add(stdout_sink, colorize=sys.stdout.isatty(), backtrace=True, level=levelno, format=format, filter=record_filter),
+                logger.add(file_sink, colorize=False, backtrace=True, level=levelno, format=format, filter=record_filter),
+            ]
+        else:
+            cls.__batching_sinks = {}
+            handler_ids = [
+                logger.add(sys.stdout, enqueue=True, backtrace=True, level=levelno, format=format, filter=record_filter),
+                logger.add(filepath, rotation=rotation, retention=retention, enqueue=True, backtrace=True, level=levelno, format=format, filter=record_filter),
+            ]
+        if structured and structured.get("enabled"):
+            structured_path = f"{os.path.splitext(filepath)[0]}.jsonl"
+            handler_ids.append(cls.add_structured_sink(structured_path, level=levelno, rotation=rotation, retention=retention, block_records=structured.get("block_records", 256)))
+
+        # 新 sink 就位后再移除旧的，重建期间其他线程记录的日志不会丢失
+        for handler_id in previous or ():
+            logger.remove(handler_id)
+        cls.__handler_ids = handler_ids
+        cls.__sink_levelno = levelno
         # logger.add(
         #     cls.__mqtt_sink,
         #     enqueue=True,
@@ -249,14 +491,52 @@ class CustomizeLogger:
         #     format=format
         # )
 
-        logging.basicConfig(handlers=[InterceptHandler(), MyInterceptor()], level=0)
-        logging.getLogger("uvicorn.access").handlers = [InterceptHandler()]
-        for _log in ["uvicorn", "uvicorn.error", "fastapi"]:
-            _logger = logging.getLogger(_log)
-            _logger.handlers = [InterceptHandler()]
+        cls.intercept_stdlib(level)
+        # request_id 等字段取自 log_context，协程和它提交的 Dask 任务各自带上自己的值
+        install_log_context()
 
         return logger.bind(request_id=None, method=None)
 
+    @classmethod
+    def add_structured_sink(cls, filepath: str, level: str | int, rotation: str, retention: str, block_records: int = 256):  # noqa: PLR0913
+        """Add an indexed JSON-lines sink next to the formatted ones, see ``log_store.LogStore``"""
+        sink = StructuredLogSink(filepath, rotation=rotation, retention=retention, block_records=block_records)
+        level = level.upper() if isinstance(level, str) else level
+        return logger.add(sink, enqueue=True, backtrace=True, level=level, filter=cls.__record_filter)
+
+    @classmethod
+    def intercept_stdlib(cls, level: str):
+        """Route stdlib logging into loguru through a single bridge handler.
+
+        The root logger level is set to the loguru threshold so that records below it
+        are rejected by ``Logger.isEnabledFor`` before any record is built. The bridge
+        itself has no level, so a logger given its own level by ``set_stdlib_levels``
+        passes records below the threshold too.
+        """
+        levelno = logger.level(level.upper()).no
+        bridge = InterceptHandler()
+        logging.basicConfig(handlers=[bridge], level=levelno, force=True)
+        for _log in ["uvicorn", "uvicorn.access", "uvicorn.error", "fastapi"]:
+            _logger = logging.getLogger(_log)
+            _logger.handlers = [bridge]
+            # 已由 bridge 处理，不再向 root 传播，避免重复输出
+            _logger.propagate = False
+
+    @classmethod
+    def set_stdlib_levels(cls, levels: dict):
+        """Set minimum levels for individual stdlib loggers, e.g. {"distributed": "warning"}.
+
+        Levels above ``log.level`` silence a library; levels below it (e.g. {"urllib3": "debug"})
+        only reach the sinks when they are part of the config given to ``make_logger``,
+        which lowers the sinks' level accordingly.
+        """
+        for name, level in (levels or {}).items():
+            _logger = logging.getLogger(name)
+            _logger.setLevel(logger.level(str(level).upper()).no)
+            # distributed 等库会挂自己的 StreamHandler 并关闭传播，这里统一交给 root 上的 bridge
+            _logger.handlers = []
+            _logger.propagate = True
+
     # @classmethod
     # def set_mqtt_client(cls, mqtt_client):
     #     cls.__mqtt_client = mqtt_client
@@ -1,11 +1,22 @@
 import asyncio
 import atexit
+import os
 import signal
 
-from dask.distributed import LocalCluster, WorkerPlugin
+from dask.distributed import LocalCluster
+from distributed.core import Status
 from loguru import logger
 
 from .config import Config
+from .custom_logging import CustomizeLogger
+from .dask_adaptive import AppAdaptive, adaptive_options
+from .dask_affinity import AffinityRouter
+from .dask_async import AsyncTaskRunner
+from .dask_cache import ResultCache
+from .dask_logging import ContextClient, LogForwarderPlugin, install_log_receiver
+from .dask_metrics import get_task_metrics, install_task_metrics, task_metrics_plugins
+from .dask_warm import reset_worker_state, scheduler_listening
+from .log_sink import parse_size
 
 
 class DaskClientSingleton:
@@ -13,6 +24,15 @@ class DaskClientSingleton:
     _client = None
     _cluster = None
     _initialized = False
+    _asynchronous = False
+    _runner = None
+    _start_lock = None
+    _result_cache = None
+    _router = None
+    _overrides = {}
+    _attached = False
+    # atexit 和信号处理函数每个进程只注册一次，暖池跨会话重新初始化时不再重复注册
+    _exit_handlers_installed = False
 
     def __new__(cls):
         if cls._instance is None:
@@ -26,22 +46,39 @@ class DaskClientSingleton:
                 logger.trace("Creating Dask client and local cluster")
                 # 在实例创建时获取配置，避免模块级别的配置初始化
                 config_data = Config().get_config()
+                self._restore_stdlib_levels(config_data)
                 # Store the cluster in a class variable to be able to close it later
-                self.__class__._cluster = LocalCluster(
-                    scheduler_port=config_data["cluster"]["scheduler_port"],
-                    dashboard_address=config_data["cluster"]["dashboard_address"],
-                    n_workers=config_data["cluster"].get("n_workers", 4),  # 进程数，默认为4
-                    threads_per_worker=config_data["cluster"].get("threads_per_worker", 2),  # 每个进程的线程数，默认为2
-                    silence_logs=True,  # 减少日志输出
-                )
-                self.__class__._client = self.__class__._cluster.get_client()
+                warm = self._connect(config_data["cluster"])
                 self.__class__._initialized = True
+                if warm:
+                    # 复用已有的 worker 进程，先清掉上一个会话留下的状态
+                    states = self.__class__._client.run(reset_worker_state)
+                    logger.info(f"Reusing {len(states)} warm Dask workers")
 
-                # 注册退出处理函数，确保程序退出时关闭资源
-                atexit.register(self._cleanup)
+                # worker 进程的日志统一批量转发回主进程，由主进程的 sink 写出
+                forward_logs = config_data["cluster"].get("forward_logs") or {}
+                if forward_logs.get("enabled"):
+                    self._forward_worker_logs(forward_logs)
 
-                # 注册信号处理函数，处理 Ctrl+C 中断
-                self._setup_signal_handlers()
+                # 按任务前缀统计数量和耗时分布，定期汇总到调度器
+                metrics = config_data["cluster"].get("metrics") or {}
+                if metrics.get("enabled"):
+                    install_task_metrics(self.__class__._client, interval=metrics.get("report_interval", 5.0))
+
+                adaptive = config_data["cluster"].get("adaptive") or {}
+                if adaptive.get("enabled") and not warm:
+                    self.__class__.adapt(adaptive)
+
+                # 配置热更新时按新的 n_workers / threads_per_worker 调整集群
+                Config.subscribe(self.__class__._on_config_change)
+
+                if not DaskClientSingleton._exit_handlers_installed:
+                    # 注册退出处理函数，确保程序退出时关闭资源
+                    atexit.register(self._cleanup)
+
+                    # 注册信号处理函数，处理 Ctrl+C 中断
+                    self._setup_signal_handlers()
+                    DaskClientSingleton._exit_handlers_installed = True
 
                 dashboard_url = f"http://localhost{config_data['cluster']['dashboard_address']}"
                 logger.trace(f"Dask client and cluster initialized successfully, open {dashboard_url} to view dashboard")
@@ -50,6 +87,193 @@ class DaskClientSingleton:
                 self._cleanup()
                 raise
 
+    @classmethod
+    def set_overrides(cls, **options):
+        """LocalCluster keyword arguments that take precedence over config.yaml for the next start"""
+        cls._overrides = options
+
+    @classmethod
+    def _cluster_options(cls, cluster_config):
+        """LocalCluster keyword arguments for the ``cluster`` config section"""
+        adaptive = cluster_config.get("adaptive") or {}
+        # 自适应模式下从 minimum 个 worker 起步，之后按负载伸缩
+        n_workers = adaptive.get("minimum", 1) if adaptive.get("enabled") else cluster_config.get("n_workers", 4)  # 进程数，默认为4
+        options = {
+            "scheduler_port": cluster_config["scheduler_port"],
+            "dashboard_address": cluster_config["dashboard_address"],
+            "n_workers": n_workers,
+            "threads_per_worker": cluster_config.get("threads_per_worker", 2),  # 每个进程的线程数，默认为2
+            "silence_logs": True,  # 减少日志输出
+        }
+        # worker 启动时就导入这些模块，任务里不再付导入的代价
+        preload = (cluster_config.get("warm_pool") or {}).get("preload")
+        if preload:
+            options["preload"] = list(preload)
+        return {**options, **cls._overrides}
+
+    @classmethod
+    def _attach_address(cls, cluster_config):
+        """Address of a scheduler already running on scheduler_port, if warm_pool.attach allows using it"""
+        port = cls._cluster_options(cluster_config)["scheduler_port"]
+        if (cluster_config.get("warm_pool") or {}).get("attach") and port and scheduler_listening(port):
+            return f"tcp://127.0.0.1:{port}"
+        return None
+
+    @classmethod
+    def _connect(cls, cluster_config):
+        """Create the synchronous client; returns True when it joined workers that were already running"""
+        if cls._cluster is not None and cls._cluster.status == Status.running:
+            # 暖池：上一个会话 close() 时保留下来的集群
+            cls._client = ContextClient(cls._cluster)
+            return True
+        address = cls._attach_address(cluster_config)
+        if address is not None:
+            logger.info(f"Attaching to the Dask scheduler at {address}")
+            cls._client = ContextClient(address)
+            cls._attached = True
+            return True
+        cls._cluster = LocalCluster(**cls._cluster_options(cluster_config))
+        cls._client = ContextClient(cls._cluster)
+        return False
+
+    @classmethod
+    def _forward_worker_logs(cls, options):
+        """Replay worker loguru records in this process, tagged with the worker address.
+
+        Returns what ``register_plugin`` returns, i.e. a coroutine for an asynchronous client.
+        """
+        client = cls._client
+        install_log_receiver(client)
+        logger.trace(f"Forwarding worker logs at level {options.get('level', 'info')}")
+        return client.register_plugin(
+            LogForwarderPlugin(
+                level=options.get("level", "info"),
+                batch_size=options.get("batch_size", 256),
+                flush_interval=options.get("flush_interval", 0.5),
+            )
+        )
+
+    @staticmethod
+    def _restore_stdlib_levels(config_data):
+        # dask.distributed 延迟到这里才导入，导入时 initialize_logging 会把 distributed 日志器重置为 INFO，
+        # 覆盖掉 make_logger 已应用的 log.stdlib_levels，需要重新应用一次
+        CustomizeLogger.set_stdlib_levels((config_data.get("log") or {}).get("stdlib_levels"))
+
+    @classmethod
+    async def start_async(cls):
+        """Create an asynchronous cluster and client inside the running event loop.
+
+        Futures of the returned client are awaitable, and ``get_runner()`` adds bounded
+        submit/map/gather helpers on top. Config hot reload does not resize an async
+        cluster; use adaptive scaling instead. Close it with ``await close()``.
+        """
+        if cls._start_lock is None:
+            cls._start_lock = asyncio.Lock()
+        async with cls._start_lock:
+            if cls._initialized:
+                if not cls._asynchronous:
+                    raise RuntimeError("A synchronous Dask client is already running in this process")
+                return cls._client
+            logger.trace("Creating asynchronous Dask client and local cluster")
+            config_data = Config().get_config()
+            cls._restore_stdlib_levels(config_data)
+            cluster_config = config_data["cluster"]
+            if cls._cluster is not None:
+                # 同步会话留下的暖集群不能被异步客户端复用
+                await cls._close_resource(cls._cluster)
+                cls._cluster = None
+            try:
+                address = cls._attach_address(cluster_config)
+                if address is not None:
+                    logger.info(f"Attaching to the Dask scheduler at {address}")
+                    cls._client = await ContextClient(address, asynchronous=True)
+                    cls._attached = True
+                else:
+                    cls._cluster = await LocalCluster(**cls._cluster_options(cluster_config), asynchronous=True)
+                    cls._client = await ContextClient(cls._cluster, asynchronous=True)
+                cls._asynchronous = True
+                cls._initialized = True
+                if cls._attached:
+                    await cls._client.run(reset_worker_state)
+
+                forward_logs = cluster_config.get("forward_logs") or {}
+                if forward_logs.get("enabled"):
+                    await cls._forward_worker_logs(forward_logs)
+
+                metrics = cluster_config.get("metrics") or {}
+                if metrics.get("enabled"):
+                    for plugin in task_metrics_plugins(metrics.get("report_interval", 5.0)):
+                        await cls._client.register_plugin(plugin)
+
+                adaptive = cluster_config.get("adaptive") or {}
+                if adaptive.get("enabled") and not cls._attached:
+                    cls.adapt(adaptive)
+
+                cls._runner = AsyncTaskRunner(cls._client, max_in_flight=cluster_config.get("max_in_flight", 1000))
+                logger.trace(f"Asynchronous Dask client initialized, open http://localhost{cluster_config['dashboard_address']} to view dashboard")
+            except Exception as e:
+                logger.error(f"Error initializing asynchronous Dask client: {e}", exc_info=True)
+                await cls.close()
+                raise
+            return cls._client
+
+    @classmethod
+    def get_runner(cls):
+        """Return the AsyncTaskRunner of the asynchronous client started by ``start_async``"""
+        if cls._runner is None:
+            raise RuntimeError("Call 'await DaskClientSingleton.start_async()' first")
+        return cls._runner
+
+    @classmethod
+    def adapt(cls, options):
+        """Let the cluster grow and shrink between options["minimum"] and options["maximum"]"""
+        kwargs = adaptive_options(options)
+        logger.info(f"Adaptive scaling between {kwargs['minimum']} and {kwargs['maximum']} workers, target duration {kwargs['target_duration']}")
+        return cls._cluster.adapt(Adaptive=AppAdaptive, **kwargs)
+
+    @classmethod
+    def _on_config_change(cls, change):
+        if cls._cluster is None or cls._asynchronous:
+            return
+        cluster_config = change.new["cluster"]
+        adaptive = cluster_config.get("adaptive") or {}
+        if change.touches("cluster.adaptive"):
+            if adaptive.get("enabled"):
+                cls.adapt(adaptive)
+                return
+            adaptive_state = getattr(cls._cluster, "_adaptive", None)
+            if adaptive_state is not None:
+                adaptive_state.stop(reason="disabled in config")
+            # 关闭自适应后回到固定的 n_workers
+        elif adaptive.get("enabled") or not change.touches("cluster.n_workers", "cluster.threads_per_worker"):
+            return
+        cls.resize(cluster_config.get("n_workers", 4), cluster_config.get("threads_per_worker", 2))
+
+    @classmethod
+    def resize(cls, n_workers, threads_per_worker=None):
+        """Scale the running cluster without restarting the scheduler or the client.
+
+        Workers whose thread count differs from ``threads_per_worker`` are replaced:
+        the new workers are started first and the old ones are retired afterwards, so
+        capacity never dips and their data is moved off before they close.
+        """
+        cluster = cls._cluster
+        if cluster is None:
+            return
+        options = cluster.new_spec.get("options", {})
+        if threads_per_worker is not None and options.get("nthreads") != threads_per_worker:
+            # new_spec 会被所有 worker_spec 条目共享，必须整体替换而不是原地修改
+            cluster.new_spec = {**cluster.new_spec, "options": {**options, "nthreads": threads_per_worker}}
+            stale = list(cluster.worker_spec)
+            logger.info(f"Replacing {len(stale)} Dask workers to use {threads_per_worker} threads each")
+            cluster.scale(len(stale) + n_workers)
+            cls._client.wait_for_workers(len(stale) + n_workers, timeout=120)
+            for name in stale:
+                del cluster.worker_spec[name]
+
+        logger.info(f"Scaling Dask cluster to {n_workers} workers")
+        cluster.scale(n_workers)
+
     def _setup_signal_handlers(self):
         """Setup signal handlers for graceful shutdown"""
         # 在Windows上只支持SIGINT和SIGTERM
@@ -98,17 +322,63 @@ class DaskClientSingleton:
         """Returns the Dask client instance."""
         return self._client
 
+    def get_router(self):
+        """Return the AffinityRouter configured by ``cluster.affinity`` for the synchronous client"""
+        cls = self.__class__
+        if cls._router is None or cls._router.client is not cls._client:
+            options = Config().get_config()["cluster"].get("affinity") or {}
+            cls._router = AffinityRouter(
+                cls._client,
+                replicas=options.get("replicas", 100),
+                strict=options.get("strict", False),
+                refresh_interval=options.get("refresh_interval", 1.0),
+            )
+        return cls._router
+
+    def get_result_cache(self):
+        """Return the ResultCache configured by ``cluster.result_cache`` around the synchronous client"""
+        cls = self.__class__
+        if cls._result_cache is None or cls._result_cache.client is not cls._client:
+            config_data = Config().get_config()
+            options = config_data["cluster"].get("result_cache") or {}
+            # 缓存目录位于 outputs 之下，跨进程运行复用
+            directory = os.path.join(config_data.get("outputs", "./outputs"), options.get("directory", "result-cache"))
+            cls._result_cache = ResultCache(
+                cls._client,
+                directory,
+                memory_limit=parse_size(options.get("memory_limit", "256 MB")),
+                disk_limit=parse_size(options.get("disk_limit", "4 GB")),
+            )
+        return cls._result_cache
+
+    @classmethod
+    async def _close_resource(cls, resource):
+        if cls._asynchronous:
+            # 异步客户端和集群直接在当前事件循环中关闭
+            await resource.close(timeout=2)
+        else:
+            # Client.close() / LocalCluster.close() are synchronous for a local cluster.
+            # Running in a thread to avoid blocking the event loop if they hang.
+            await asyncio.to_thread(resource.close, timeout=2)  # 缩短超时时间
+
     @classmethod
-    async def close(cls):
-        """Closes the Dask client and the local cluster asynchronously."""
+    async def close(cls, keep_warm=None):
+        """Closes the Dask client and the local cluster asynchronously.
+
+        With ``keep_warm`` (default: ``cluster.warm_pool.enabled``) only the client is
+        closed and the workers stay up for the next session of this process. An attached
+        scheduler is never closed, and an asynchronous cluster is always closed because
+        it belongs to the running event loop.
+        """
         logger.trace("DaskClientSingleton.close() called.")
+        if keep_warm is None:
+            keep_warm = bool((Config().get_config()["cluster"].get("warm_pool") or {}).get("enabled"))
+        keep_warm = keep_warm and not cls._asynchronous
         try:
             if cls._client is not None:
                 logger.trace("Attempting to close Dask client...")
                 try:
-                    # Client.close() is synchronous for a local cluster and returns None.
-                    # Running in a thread to avoid blocking the event loop if it hangs.
-                    await asyncio.to_thread(cls._client.close, timeout=2)
+                    await cls._close_resource(cls._client)
                     logger.trace("Dask client close() method called successfully.")
                 except Exception as e:
                     logger.debug(f"Exception during Dask client.close(): {e}")
@@ -118,12 +388,12 @@ class DaskClientSingleton:
             else:
                 logger.trace("Dask client was already None.")
 
-            if cls._cluster is not None:
+            if cls._cluster is not None and keep_warm:
+                logger.info("Keeping the Dask local cluster warm for the next session")
+            elif cls._cluster is not None:
                 logger.trace("Attempting to close Dask local cluster...")
                 try:
-                    # LocalCluster.close() is synchronous. Using a timeout.
-                    # Running in a thread to avoid blocking the event loop.
-                    await asyncio.to_thread(cls._cluster.close, timeout=2)  # 缩短超时时间
+                    await cls._close_resource(cls._cluster)
                     logger.trace("Dask local cluster close() method called successfully.")
                 except Exception as e:
                     logger.debug(f"Exception during Dask local cluster.close(): {e}")
@@ -135,75 +405,41 @@ class DaskClientSingleton:
 
             cls._instance = None  # Reset instance so it can be recreated if needed
             cls._initialized = False  # 重置初始化状态
+            cls._asynchronous = False
+            cls._attached = False
+            cls._runner = None
             logger.trace("DaskClientSingleton instance reset.")
         except Exception as e:
             logger.error(f"Error during Dask close: {e}", exc_info=True)
 
 
-class Counter(WorkerPlugin):
-    def __init__(self, worker1_address):
-        logger.info(f"XXXXXXXXXX Counter init: {worker1_address}")
-        self.worker1_address = worker1_address
-
-    def setup(self, worker):
-        if worker.address == self.worker1_address:
-            logger.info(f"XXXXXXXXXX Counter setup, worker: {worker}")
-            self.counter = 10
-            worker.data["counter"] = self.counter
-
-    def teardown(self, worker):
-        if worker.address == self.worker1_address:
-            logger.info(f"XXXXXXXXXX Counter teardown, worker: {worker}")
-            self.counter = 0
-
-    def transition(self, key, start, finish, *args, **kwargs):
-        logger.info(f"XXXXXXXXXX Counter transition, start: {start}")
-        if start == "executing":
-            self.counter += 1
-
-
-class MyWebSocketPlugin(WorkerPlugin):
-    def __init__(self, base_ws_url="ws://example.com/"):
-        self.base_ws_url = base_ws_url
-        self.ws_connection = None
-        self.worker_name = None
-        logger.info("MyWebSocketPlugin: Plugin instance created.")
-
-    async def setup(self, worker):
-        """在 Worker 启动时调用"""
-        self.worker_name = worker.name
-        # self.ws_connection = WebSocketConnection(ws_url)
-        await self.ws_connection.connect()
-
-        # 将插件实例存储在 Worker 的属性中，以便任务函数访问
-        # 推荐将资源直接挂载到 worker.data 字典中
-        worker.data["ws_connection"] = self.ws_connection
-        worker.data["plugin_initialized"] = True
-        logger.info(f"MyWebSocketPlugin on {self.worker_name}: Setup complete.")
-
-    async def teardown(self, worker):
-        """在 Worker 关闭时调用"""
-        if self.ws_connection:
-            await self.ws_connection.close()
-        logger.info(f"MyWebSocketPlugin on {self.worker_name}: Teardown complete.")
-
-    # 可以在这里添加其他生命周期方法，例如：
-    # async def transition(self, key, start, finish, **kwargs):
-    #     """在任务状态转换时调用"""
-    #     if finish == 'executing':
-    #         print(f"Worker {self.worker_name}: Starting task {key}")
-    #     elif finish == 'finished':
-    #         print(f"Worker {self.worker_name}: Finished task {key}")
-
-
 def init_dask():
     singleton = DaskClientSingleton()
     client = singleton.get_client()
     worker_addresses = list(client.scheduler_info()["workers"].keys())
-    worker1_address = worker_addresses[0]
     logger.info(f"Available Worker Addresses: {worker_addresses}")
+    return client
+
+
+def get_metrics(prefix=None):
+    """Per-task-prefix counts and latencies aggregated on the scheduler (needs cluster.metrics.enabled)"""
+    client = DaskClientSingleton().get_client()
+    return get_task_metrics(client, prefix=prefix)
+
+
+def get_router():
+    """Consistent-hash routing of keyed tasks to workers, see AffinityRouter"""
+    return DaskClientSingleton().get_router()
+
+
+def get_result_cache():
+    """Memoizing submit/map around the Dask client, see ResultCache"""
+    return DaskClientSingleton().get_result_cache()
+
 
-    client.register_worker_plugin(Counter(worker1_address), "counter")
+async def get_async_dask_client():
+    """Start (once) and return the asynchronous Dask client bound to the running loop."""
+    return await DaskClientSingleton.start_async()
 
 
 def get_dask_client():
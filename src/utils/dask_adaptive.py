@@ -0,0 +1,77 @@
+import math
+
+from dask.distributed import Adaptive
+from dask.utils import parse_timedelta
+from loguru import logger
+
+
+class AppAdaptive(Adaptive):
+    """Adaptive scaling on scheduler queue depth and worker memory pressure.
+
+    The CPU side is the scheduler's own ``adaptive_target``: queued plus processing
+    work divided by ``target_duration``. On top of that one worker is added whenever
+    the workers' process memory exceeds ``memory_threshold`` of their combined
+    ``memory_limit``, which also counts memory the scheduler does not manage (e.g.
+    buffers held by libraries). Every scale up and down is reported through loguru
+    together with the load that caused it.
+    """
+
+    def __init__(self, cluster=None, memory_threshold=0.7, **kwargs):
+        self.memory_threshold = memory_threshold
+        self._load = None
+        super().__init__(cluster, **kwargs)
+
+    def _observe(self):
+        """Return (queued, processing, memory fraction) read from the in-process scheduler"""
+        scheduler = getattr(self.cluster, "scheduler", None)
+        workers = getattr(scheduler, "workers", None)
+        if workers is None:
+            # 调度器不在本进程内时只能依赖 adaptive_target
+            return None
+        queued = len(scheduler.queued) + len(scheduler.unrunnable)
+        processing = sum(len(ws.processing) for ws in workers.values())
+        limit = sum(ws.memory_limit or 0 for ws in workers.values())
+        used = sum(ws.memory.process for ws in workers.values())
+        return queued, processing, used / limit if limit else 0.0
+
+    async def target(self):
+        target = await super().target()
+        self._load = self._observe()
+        if self._load is not None and self._load[2] >= self.memory_threshold:
+            # 内存压力下至少多加一个 worker，同时阻止缩容
+            target = max(target, len(self.plan) + 1)
+        return target
+
+    def _describe_load(self):
+        if self._load is None:
+            return "load unknown"
+        queued, processing, memory = self._load
+        return f"queued={queued}, processing={processing}, memory={memory:.0%}"
+
+    async def scale_up(self, n):
+        logger.info(f"Adaptive scale up: {len(self.plan)} -> {n} workers ({self._describe_load()})")
+        await super().scale_up(n)
+
+    async def scale_down(self, workers):
+        if not workers:
+            return
+        logger.info(f"Adaptive scale down: retiring {len(workers)} of {len(self.plan)} workers ({self._describe_load()})")
+        await super().scale_down(workers)
+
+
+def adaptive_options(config) -> dict:
+    """Translate the ``cluster.adaptive`` config section into ``cluster.adapt`` kwargs.
+
+    ``idle_timeout`` is how long a worker has to stay surplus before it is retired;
+    Adaptive counts that in checks, so it becomes ``wait_count`` intervals.
+    """
+    interval = parse_timedelta(config.get("interval", "1s"))
+    idle_timeout = parse_timedelta(config.get("idle_timeout", "60s"))
+    return {
+        "minimum": config.get("minimum", 1),
+        "maximum": config.get("maximum", 4),
+        "target_duration": config.get("target_duration", "5s"),
+        "interval": interval,
+        "wait_count": max(1, math.ceil(idle_timeout / interval)),
+        "memory_threshold": config.get("memory_threshold", 0.7),
+    }
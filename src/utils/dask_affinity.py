@@ -0,0 +1,175 @@
+import bisect
+import hashlib
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from dask.distributed import get_worker
+from loguru import logger
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hash ring with ``replicas`` virtual points per node.
+
+    Adding or removing a node only moves the keys between its points and their
+    predecessors, i.e. about 1/N of all keys.
+    """
+
+    def __init__(self, nodes=(), replicas=100):
+        self.replicas = replicas
+        self._points = []
+        self._owners = []
+        self.nodes = set()
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        if node in self.nodes:
+            return
+        self.nodes.add(node)
+        for i in range(self.replicas):
+            point = _hash(f"{node}#{i}")
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node):
+        if node not in self.nodes:
+            return
+        self.nodes.discard(node)
+        keep = [(p, o) for p, o in zip(self._points, self._owners, strict=True) if o != node]
+        self._points = [p for p, _ in keep]
+        self._owners = [o for _, o in keep]
+
+    def get(self, key):
+        """Node owning ``key``, or None for an empty ring"""
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, _hash(str(key))) % len(self._points)
+        return self._owners[index]
+
+
+class AffinityRouter:
+    """Send every task for the same routing key to the same worker.
+
+    Workers are placed on a ``HashRing``. The worker list is re-read from the
+    scheduler at most every ``refresh_interval`` seconds and only the workers that
+    came or went are added to or removed from the ring, so scaling remaps only their
+    keys. Tasks read and build their warm state with ``local_state``. With
+    ``strict=False`` a task may still run elsewhere if its worker is gone; with
+    ``strict=True`` it waits for that worker.
+    """
+
+    def __init__(self, client, replicas=100, strict=False, refresh_interval=1.0):
+        self.client = client
+        self.strict = strict
+        self.refresh_interval = refresh_interval
+        self._ring = HashRing(replicas=replicas)
+        self._workers = frozenset()
+        self._refreshed_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def refresh(self, force=False):
+        """Sync the ring with the scheduler's workers (a round trip, hence rate limited)"""
+        now = time.monotonic()
+        if not force and now - self._refreshed_at < self.refresh_interval:
+            return
+        self._refreshed_at = now
+        workers = frozenset(self.client.scheduler_info(n_workers=-1)["workers"])
+        if workers == self._workers:
+            return
+        with self._lock:
+            added, removed = workers - self._workers, self._workers - workers
+            for address in removed:
+                self._ring.remove(address)
+            for address in added:
+                self._ring.add(address)
+            self._workers = workers
+        logger.debug(f"Affinity ring updated: +{len(added)} -{len(removed)} workers, {len(workers)} total")
+
+    def worker_for(self, key):
+        """Address of the worker that owns ``key``"""
+        self.refresh()
+        return self._ring.get(key)
+
+    def submit(self, key, func, *args, **kwargs):
+        """``Client.submit`` pinned to the worker owning ``key``"""
+        worker = self.worker_for(key)
+        if worker is None:
+            return self.client.submit(func, *args, **kwargs)
+        return self.client.submit(func, *args, workers=[worker], allow_other_workers=not self.strict, **kwargs)
+
+    def map(self, func, keys, *iterables, **kwargs):
+        """Run ``func(key, *args)`` for every routing key, zipped with the extra iterables"""
+        return [self.submit(key, func, key, *args, **kwargs) for key, *args in zip(keys, *iterables, strict=False)]
+
+
+class _LocalStates:
+    """LRU of warm per-key state on one worker, with hit/miss counters"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, factory):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+        # 构建可能很慢，不持锁；并发构建同一个键时保留先完成的那个
+        value = factory()
+        with self.lock:
+            value = self.entries.setdefault(key, value)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+        return value
+
+
+# 不放进 worker.data：那里的对象计入托管内存，内存紧张时会被序列化溢写到磁盘
+_states = weakref.WeakKeyDictionary()
+_states_lock = threading.Lock()
+
+
+def _local_states(worker, capacity=1024):
+    with _states_lock:
+        states = _states.get(worker)
+        if states is None:
+            states = _states[worker] = _LocalStates(capacity)
+        return states
+
+
+def local_state(key, factory, capacity=1024):
+    """Return this worker's state for ``key``, creating it with ``factory()`` on first use.
+
+    Call it from tasks submitted through ``AffinityRouter`` so that the same key keeps
+    hitting the same warm state. At most ``capacity`` keys are kept per worker.
+    """
+    return _local_states(get_worker(), capacity).get(key, factory)
+
+
+def clear_local_state(worker) -> int:
+    """Drop all local state of ``worker``; returns how many keys were dropped"""
+    with _states_lock:
+        states = _states.pop(worker, None)
+    return len(states.entries) if states is not None else 0
+
+
+def local_state_stats(client) -> dict:
+    """``{worker address: {"hits", "misses", "entries"}}`` of the local state caches"""
+    return client.run(_stats)
+
+
+def _stats(dask_worker):
+    states = _local_states(dask_worker)
+    with states.lock:
+        return {"hits": states.hits, "misses": states.misses, "entries": len(states.entries)}
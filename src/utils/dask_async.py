@@ -0,0 +1,66 @@
+import asyncio
+
+from loguru import logger
+
+
+class AsyncTaskRunner:
+    """Awaitable submit/map/gather on an asynchronous Dask client with bounded in-flight work.
+
+    ``submit`` waits for one of ``max_in_flight`` slots before handing the task to the
+    scheduler and returns the Dask future immediately after; the slot is released once
+    that future finishes, errs or is cancelled. Producers are therefore slowed down
+    instead of piling up unbounded futures, while the event loop stays free for the
+    app's own I/O. Must be used from the loop the client was created in.
+    """
+
+    def __init__(self, client, max_in_flight=1000):
+        if not client.asynchronous:
+            raise ValueError("AsyncTaskRunner needs a client created with asynchronous=True")
+        self.client = client
+        self.max_in_flight = max_in_flight
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._loop = asyncio.get_running_loop()
+        # 已占用的名额数，只在事件循环线程中修改
+        self._in_flight = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _free_slot(self):
+        self._in_flight -= 1
+        self._slots.release()
+
+    def _release(self, _future):
+        # Dask 在自己的回调线程中执行 done 回调，这里切回事件循环线程释放名额
+        self._loop.call_soon_threadsafe(self._free_slot)
+
+    async def submit(self, func, *args, **kwargs):
+        """Wait for a free slot, then submit like ``Client.submit`` and return the future"""
+        await self._slots.acquire()
+        self._in_flight += 1
+        try:
+            future = self.client.submit(func, *args, **kwargs)
+        except BaseException:
+            self._free_slot()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    async def map(self, func, *iterables, **kwargs):
+        """Submit ``func`` over the zipped iterables, at most ``max_in_flight`` at a time.
+
+        Returns the futures in input order. Items are submitted one by one as slots free
+        up, so a long iterable is consumed lazily rather than all at once.
+        """
+        return [await self.submit(func, *args, **kwargs) for args in zip(*iterables, strict=False)]
+
+    async def gather(self, futures, errors="raise"):
+        """Await the results of ``futures`` (see ``Client.gather``)"""
+        return await self.client.gather(futures, errors=errors)
+
+    async def run(self, func, *iterables, **kwargs):
+        """``map`` followed by ``gather``: return the results in input order"""
+        futures = await self.map(func, *iterables, **kwargs)
+        logger.trace(f"Gathering {len(futures)} results ({self.in_flight} still in flight)")
+        return await self.gather(futures)
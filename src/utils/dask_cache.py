@@ -0,0 +1,254 @@
+import contextlib
+import hashlib
+import marshal
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import dask
+from dask.base import tokenize
+from dask.sizeof import sizeof
+from loguru import logger
+
+_SUFFIX = ".pkl"
+
+
+def _function_token(func):
+    """Identity of a function that changes when its code does, so edits invalidate the cache"""
+    code = getattr(func, "__code__", None)
+    if code is None:
+        return tokenize(func)
+    try:
+        code_hash = hashlib.sha1(marshal.dumps(code)).hexdigest()
+    except ValueError:
+        # 闭包常量等无法 marshal 的情况退回到 dask 的 tokenize
+        return tokenize(func)
+    return f"{func.__module__}.{func.__qualname__}:{code_hash}:{tokenize(func.__defaults__, func.__kwdefaults__)}"
+
+
+def cache_key(func, args, kwargs):
+    """Content address of a call, or None when an argument cannot be hashed deterministically"""
+    try:
+        with dask.config.set({"tokenize.ensure-deterministic": True}):
+            return tokenize(_function_token(func), args, kwargs)
+    except Exception:
+        return None
+
+
+class _DiskStore:
+    """Pickled results under ``directory``, evicting least recently used files beyond ``limit`` bytes.
+
+    File reads and writes need no lock; the index methods must be called under the
+    owning cache's lock.
+    """
+
+    def __init__(self, directory, limit):
+        self.directory = directory
+        self.limit = limit
+        os.makedirs(directory, exist_ok=True)
+        # key -> size，按最近使用排序；启动时按 mtime 恢复顺序，跨进程复用之前的结果
+        self.index = OrderedDict()
+        self.total = 0
+        entries = []
+        for entry in os.scandir(directory):
+            if entry.name.endswith(_SUFFIX):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, entry.name[: -len(_SUFFIX)], stat.st_size))
+        for _, key, size in sorted(entries):
+            self.index[key] = size
+            self.total += size
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    def read(self, key):
+        """Return (True, value) or (False, None)"""
+        try:
+            with open(self._path(key), "rb") as f:
+                value = pickle.load(f)
+            os.utime(self._path(key))
+        except (OSError, EOFError, pickle.UnpicklingError) as e:
+            logger.debug(f"Result cache entry {key} unreadable: {e}")
+            return False, None
+        return True, value
+
+    def write(self, key, payload):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+    def record(self, key, size):
+        """Add a written file to the index and return how many files were evicted"""
+        self.total += size - self.index.pop(key, 0)
+        self.index[key] = size
+        evicted = 0
+        while self.total > self.limit and self.index:
+            self.drop(next(iter(self.index)))
+            evicted += 1
+        return evicted
+
+    def drop(self, key):
+        self.total -= self.index.pop(key, 0)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self._path(key))
+
+
+class ResultCache:
+    """Memoize pure functions submitted to a Dask client, keyed by function and arguments.
+
+    A call is addressed by the function's module, name and bytecode plus a
+    deterministic ``tokenize`` of its arguments. Results live in a memory LRU limited
+    to ``memory_limit`` bytes (as estimated by ``dask.sizeof``) and are written through
+    to pickles under ``directory``, limited to ``disk_limit`` bytes, so later runs hit
+    the disk store. Identical calls submitted while the first one is still running
+    share its computation. Calls whose arguments cannot be tokenized deterministically
+    and results that fail to pickle are computed normally and not cached.
+
+    ``submit`` and ``map`` return ``concurrent.futures.Future`` objects.
+    """
+
+    def __init__(self, client, directory, memory_limit=256 * 2**20, disk_limit=4 * 2**30):
+        self.client = client
+        self.memory_limit = memory_limit
+        self._memory = OrderedDict()  # key -> (value, nbytes)
+        self._memory_bytes = 0
+        self._disk = _DiskStore(directory, disk_limit)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(("memory_hits", "disk_hits", "misses", "coalesced", "bypassed", "memory_evictions", "disk_evictions", "errors"), 0)
+
+    def _remember(self, key, value, nbytes):
+        # 调用方持有 self._lock
+        if nbytes > self.memory_limit:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= old[1]
+        self._memory[key] = (value, nbytes)
+        self._memory_bytes += nbytes
+        while self._memory_bytes > self.memory_limit:
+            _, (_, evicted) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted
+            self._counters["memory_evictions"] += 1
+
+    def _from_disk(self, key):
+        found, value = self._disk.read(key)
+        with self._lock:
+            if not found:
+                self._disk.drop(key)
+                return False, None
+            self._counters["disk_hits"] += 1
+            if key in self._disk.index:
+                self._disk.index.move_to_end(key)
+            self._remember(key, value, sizeof(value))
+        return True, value
+
+    def submit(self, func, *args, **kwargs) -> Future:
+        """Like ``Client.submit`` for a pure function, answered from the cache when possible"""
+        key = cache_key(func, args, kwargs)
+        result = Future()
+        if key is None:
+            with self._lock:
+                self._counters["bypassed"] += 1
+            self._track(self.client.submit(func, *args, **kwargs), result, None)
+            return result
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                result.set_result(entry[0])
+                return result
+            on_disk = key in self._disk.index
+
+        if on_disk:
+            found, value = self._from_disk(key)
+            if found:
+                result.set_result(value)
+                return result
+
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None:
+                self._counters["coalesced"] += 1
+                return pending
+            self._counters["misses"] += 1
+            self._pending[key] = result
+
+        try:
+            dask_future = self.client.submit(func, *args, key=f"{getattr(func, '__name__', 'cached')}-{key}", **kwargs)
+        except BaseException as e:
+            # 提交失败（客户端已关闭、无法序列化等）时撤掉占位，已合并到这里的调用者也收到同样的错误
+            with self._lock:
+                self._counters["errors"] += 1
+                self._pending.pop(key, None)
+            result.set_exception(e)
+            raise
+        self._track(dask_future, result, key)
+        return result
+
+    def map(self, func, *iterables, **kwargs) -> list:
+        """``submit`` over the zipped iterables; returns the futures in input order"""
+        return [self.submit(func, *args, **kwargs) for args in zip(*iterables, strict=False)]
+
+    @staticmethod
+    def gather(futures) -> list:
+        """Block until every future is done and return the results in order"""
+        return [future.result() for future in futures]
+
+    def _track(self, dask_future, result, key):
+        def _done(dask_future):
+            try:
+                value = dask_future.result()
+            except BaseException as e:
+                with self._lock:
+                    self._counters["errors"] += 1
+                    self._pending.pop(key, None)
+                result.set_exception(e)
+                return
+            if key is not None:
+                self._store(key, value)
+            result.set_result(value)
+
+        dask_future.add_done_callback(_done)
+
+    def _store(self, key, value):
+        written = 0
+        try:
+            payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            if len(payload) <= self._disk.limit:
+                self._disk.write(key, payload)
+                written = len(payload)
+        except OSError as e:
+            logger.warning(f"Could not write result cache entry {key}: {e}")
+        except Exception as e:
+            logger.debug(f"Result {key} not cached on disk: {e}")
+        with self._lock:
+            self._remember(key, value, sizeof(value))
+            if written:
+                self._counters["disk_evictions"] += self._disk.record(key, written)
+            self._pending.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._counters,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": len(self._disk.index),
+                "disk_bytes": self._disk.total,
+            }
+
+    def clear(self, disk=False):
+        """Drop the memory LRU, and with ``disk=True`` the on-disk store too"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            if disk:
+                for key in list(self._disk.index):
+                    self._disk.drop(key)
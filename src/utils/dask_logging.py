@@ -0,0 +1,175 @@
+import threading
+import uuid
+from collections import deque
+
+from dask.base import tokenize
+from dask.distributed import Client, WorkerPlugin
+from dask.utils import funcname
+from loguru import logger
+from tornado.ioloop import PeriodicCallback
+
+from .log_scope import get_context, run_in_context
+
+LOG_TOPIC = "app-logs"
+
+_PLAIN_TYPES = (str, int, float, bool, type(None))
+
+
+class _WorkerProcess:
+    """Stand-in for loguru's record["process"] so "{process.id}" shows the worker pid"""
+
+    __slots__ = ("id", "name")
+
+    def __init__(self, pid, name):
+        self.id = pid
+        self.name = name
+
+    def __format__(self, spec):
+        return format(self.id, spec)
+
+
+class LogForwarderPlugin(WorkerPlugin):
+    """Ship a worker's loguru records to the client in batches.
+
+    On setup the worker's own loguru handlers are replaced with a buffering sink at
+    ``level``, so records below it are never built, let alone sent. The buffer is
+    flushed every ``flush_interval`` seconds, or as soon as ``batch_size`` records are
+    pending, as one ``log_event`` message on ``topic``. ``install_log_receiver`` replays
+    them into the parent's sinks.
+    """
+
+    name = "log-forwarder"
+    idempotent = True
+
+    def __init__(self, level="INFO", batch_size=256, flush_interval=0.5, max_buffer=10000, topic=LOG_TOPIC):  # noqa: PLR0913
+        self.level = level.upper()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.topic = topic
+
+    def setup(self, worker):
+        self._worker = worker
+        self._buffer = deque(maxlen=self.max_buffer)
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+        logger.remove()
+        self._handler_id = logger.add(self._collect, level=self.level, format="{message}", catch=True)
+
+        callback = PeriodicCallback(self.flush, self.flush_interval * 1000)
+        worker.periodic_callbacks[self.name] = callback
+        callback.start()
+
+    def teardown(self, worker):
+        callback = worker.periodic_callbacks.pop(self.name, None)
+        if callback is not None:
+            callback.stop()
+        logger.remove(self._handler_id)
+        self.flush()
+
+    def _collect(self, message):
+        record = message.record
+        entry = {
+            "t": record["time"].timestamp(),
+            "lv": record["level"].name,
+            "m": record["name"],
+            "f": record["function"],
+            "ln": record["line"],
+            "p": record["process"].id,
+            "msg": record["message"],
+        }
+        if record["extra"]:
+            # log_event 要求消息可被 msgpack 序列化
+            entry["x"] = {k: v if isinstance(v, _PLAIN_TYPES) else str(v) for k, v in record["extra"].items()}
+        if record["exception"] is not None:
+            entry["exc"] = repr(record["exception"].value)
+
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1
+            self._buffer.append(entry)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self._worker.loop.add_callback(self.flush)
+
+    def flush(self):
+        """Send every pending record as one event"""
+        with self._lock:
+            if not self._buffer:
+                return
+            records = list(self._buffer)
+            self._buffer.clear()
+            dropped, self.dropped = self.dropped, 0
+        self._worker.log_event(self.topic, {"worker": self._worker.address, "records": records, "dropped": dropped})
+
+
+def _replay(event):
+    _, msg = event
+    worker = msg["worker"]
+    for entry in msg["records"]:
+
+        def _restore(record, entry=entry):
+            # 沿用 loguru 自己的 datetime 子类，格式串里的 YYYY-MM-DD 等占位符才能生效
+            record.update(
+                time=type(record["time"]).fromtimestamp(entry["t"], tz=record["time"].tzinfo),
+                name=entry["m"],
+                function=entry["f"],
+                line=entry["ln"],
+                process=_WorkerProcess(entry["p"], worker),
+            )
+
+        message = entry["msg"]
+        if "exc" in entry:
+            message = f"{message}\n{entry['exc']}"
+        # 记录自带的 worker 字段（任务里 bind 的或日志上下文带来的）被转发来源的地址覆盖，而不是重复传参
+        logger.patch(_restore).bind(**{**entry.get("x", {}), "worker": worker}).log(entry["lv"], message)
+
+    if msg.get("dropped"):
+        logger.bind(worker=worker).warning(f"Worker {worker} dropped {msg['dropped']} log records because its forward buffer was full")
+
+
+class InContext:
+    """A task function bound to the log context it was submitted from"""
+
+    __slots__ = ("context", "func")
+
+    def __init__(self, context, func):
+        self.context = context
+        self.func = func
+
+    def __call__(self, *args, **kwargs):
+        return run_in_context(self.context, self.func, *args, **kwargs)
+
+    def __dask_tokenize__(self):
+        return ("InContext", tokenize(self.func), sorted(self.context.items()))
+
+
+class ContextClient(Client):
+    """Client whose ``submit`` and ``map`` carry the caller's log context into the tasks.
+
+    Each task runs under ``run_in_context`` on the worker, so the records it logs carry
+    the submitter's ``request_id`` and other ``log_context`` fields. Keys keep the
+    function name as prefix, so task metrics and the dashboard are unaffected. Without
+    a context the calls go straight to ``Client``.
+    """
+
+    def submit(self, func, *args, key=None, pure=True, actor=False, actors=False, **kwargs):  # noqa: PLR0913
+        context = get_context()
+        if not context or actor or actors or isinstance(func, InContext):
+            return super().submit(func, *args, key=key, pure=pure, actor=actor, actors=actors, **kwargs)
+        if key is None:
+            # 与 Client.submit 相同的命名方式，上下文计入 token
+            key = f"{funcname(func)}-{tokenize(func, kwargs, *args, context) if pure else uuid.uuid4()}"
+        return super().submit(InContext(context, func), *args, key=key, pure=pure, **kwargs)
+
+    def map(self, func, *iterables, key=None, actor=False, actors=False, **kwargs):  # noqa: PLR0913
+        context = get_context()
+        if not context or actor or actors or isinstance(func, InContext):
+            return super().map(func, *iterables, key=key, actor=actor, actors=actors, **kwargs)
+        return super().map(InContext(context, func), *iterables, key=key or funcname(func), **kwargs)
+
+
+def install_log_receiver(client, topic=LOG_TOPIC):
+    """Replay forwarded worker records into this process's loguru sinks"""
+    client.subscribe_topic(topic, _replay)
@@ -0,0 +1,232 @@
+from array import array
+from time import perf_counter
+
+from dask.distributed import SchedulerPlugin, WorkerPlugin
+from dask.utils import key_split
+from loguru import logger
+from tornado import web
+from tornado.ioloop import PeriodicCallback
+
+METRICS_OP = "task-metrics"
+METRICS_HANDLER = "task_metrics"
+PROMETHEUS_ROUTE = "/metrics/tasks"
+
+# 延迟直方图：第 i 个桶统计 [2^(i-1), 2^i) 微秒的任务，最后一个桶兜底（2^25 微秒，约 33.5 秒以上）
+N_BUCKETS = 27
+# 有上界的桶的上界（秒）；兜底桶没有上界，导出时只计入 +Inf
+BUCKET_BOUNDS = tuple(2**i / 1e6 for i in range(N_BUCKETS - 1))
+
+OUTCOMES = ("memory", "error", "other")
+_OUTCOME_INDEX = {"memory": 0, "error": 1}
+_RUNNING = frozenset(("executing", "long-running"))
+
+
+class _PrefixMetrics:
+    """Counts and latency histogram of one task prefix, in fixed-size arrays"""
+
+    __slots__ = ("counts", "histogram", "total")
+
+    def __init__(self):
+        self.counts = array("Q", bytes(8 * len(OUTCOMES)))
+        self.histogram = array("Q", bytes(8 * N_BUCKETS))
+        self.total = 0.0
+
+    def snapshot(self):
+        return [self.counts.tolist(), self.histogram.tolist(), self.total]
+
+
+class TaskMetricsPlugin(WorkerPlugin):
+    """Per-task-prefix counts and execution latency histograms on every worker.
+
+    ``transition`` is called by the worker state machine on its event loop thread,
+    so the arrays need no lock. The hot path is a dict lookup, a ``perf_counter``
+    call and two array increments. Every ``interval`` seconds the cumulative
+    numbers are sent to ``TaskMetricsAggregator`` on the scheduler over the
+    worker's batched stream, if anything changed since the last report.
+    """
+
+    name = "task-metrics"
+    idempotent = True
+
+    def __init__(self, interval=5.0):
+        self.interval = interval
+
+    def setup(self, worker):
+        self._worker = worker
+        self._tasks = worker.state.tasks
+        self._started = {}
+        self._prefixes = {}
+        self._dirty = False
+
+        callback = PeriodicCallback(self.report, self.interval * 1000)
+        worker.periodic_callbacks[self.name] = callback
+        callback.start()
+
+    def teardown(self, worker):
+        callback = worker.periodic_callbacks.pop(self.name, None)
+        if callback is not None:
+            callback.stop()
+        self.report()
+
+    def transition(self, key, start, finish, *args, **kwargs):
+        if finish in _RUNNING:
+            # executing -> long-running（secede）不重新计时
+            self._started.setdefault(key, perf_counter())
+            return
+        if start not in _RUNNING:
+            return
+        started = self._started.pop(key, None)
+        if started is None:
+            return
+        elapsed = perf_counter() - started
+
+        ts = self._tasks.get(key)
+        prefix = ts.prefix if ts is not None else key_split(key)
+        metrics = self._prefixes.get(prefix)
+        if metrics is None:
+            metrics = self._prefixes[prefix] = _PrefixMetrics()
+        metrics.counts[_OUTCOME_INDEX.get(finish, 2)] += 1
+        metrics.histogram[min(int(elapsed * 1e6).bit_length(), N_BUCKETS - 1)] += 1
+        metrics.total += elapsed
+        self._dirty = True
+
+    def snapshot(self) -> dict:
+        """Cumulative metrics of this worker as ``{prefix: [counts, histogram, total]}``"""
+        return {prefix: metrics.snapshot() for prefix, metrics in self._prefixes.items()}
+
+    def report(self):
+        if not self._dirty:
+            return
+        self._dirty = False
+        self._worker.batched_send({"op": METRICS_OP, "metrics": self.snapshot()})
+
+
+def _merge(into, snapshot):
+    for prefix, (counts, histogram, total) in snapshot.items():
+        merged = into.get(prefix)
+        if merged is None:
+            into[prefix] = [list(counts), list(histogram), total]
+            continue
+        merged[0] = [a + b for a, b in zip(merged[0], counts, strict=True)]
+        merged[1] = [a + b for a, b in zip(merged[1], histogram, strict=True)]
+        merged[2] += total
+
+
+def _quantile(histogram, count, q):
+    """Upper bound (seconds) of the bucket holding the q-th quantile; the overflow bucket reports its lower bound"""
+    if not count:
+        return None
+    rank = q * count
+    seen = 0
+    for bound, n in zip(BUCKET_BOUNDS, histogram[:-1], strict=True):
+        seen += n
+        if seen >= rank:
+            return bound
+    return BUCKET_BOUNDS[-1]
+
+
+def summarize(merged) -> dict:
+    """Turn merged ``[counts, histogram, total]`` entries into readable per-prefix stats"""
+    result = {}
+    for prefix, (counts, histogram, total) in sorted(merged.items()):
+        count = sum(counts)
+        result[prefix] = {
+            **dict(zip(OUTCOMES, counts, strict=True)),
+            "count": count,
+            "total_seconds": total,
+            "mean_seconds": total / count if count else None,
+            "p50_seconds": _quantile(histogram, count, 0.5),
+            "p99_seconds": _quantile(histogram, count, 0.99),
+            "histogram": histogram,
+        }
+    return result
+
+
+def render_prometheus(summary) -> str:
+    """Prometheus text exposition of ``summarize()`` output"""
+    lines = [
+        "# HELP app_task_duration_seconds Task execution time on workers by task prefix",
+        "# TYPE app_task_duration_seconds histogram",
+    ]
+    for prefix, stats in summary.items():
+        label = prefix.replace("\\", "\\\\").replace('"', '\\"')
+        cumulative = 0
+        for bound, n in zip(BUCKET_BOUNDS, stats["histogram"][:-1], strict=True):
+            cumulative += n
+            lines.append(f'app_task_duration_seconds_bucket{{prefix="{label}",le="{bound:g}"}} {cumulative}')
+        lines.append(f'app_task_duration_seconds_bucket{{prefix="{label}",le="+Inf"}} {stats["count"]}')
+        lines.append(f'app_task_duration_seconds_sum{{prefix="{label}"}} {stats["total_seconds"]}')
+        lines.append(f'app_task_duration_seconds_count{{prefix="{label}"}} {stats["count"]}')
+    lines.append("# HELP app_tasks_total Finished tasks on workers by task prefix and outcome")
+    lines.append("# TYPE app_tasks_total counter")
+    for prefix, stats in summary.items():
+        label = prefix.replace("\\", "\\\\").replace('"', '\\"')
+        lines.extend(f'app_tasks_total{{prefix="{label}",outcome="{outcome}"}} {stats[outcome]}' for outcome in OUTCOMES)
+    return "\n".join(lines) + "\n"
+
+
+class _PrometheusHandler(web.RequestHandler):
+    def initialize(self, aggregator):
+        self.aggregator = aggregator
+
+    def get(self):
+        self.set_header("Content-Type", "text/plain; version=0.0.4")
+        self.write(render_prometheus(self.aggregator.query()))
+
+
+class TaskMetricsAggregator(SchedulerPlugin):
+    """Collect the reports of ``TaskMetricsPlugin`` on the scheduler.
+
+    Keeps the latest cumulative report of every worker and folds it into a retired
+    total when the worker leaves, so adaptive scale-down loses nothing. Exposes the
+    merged numbers through the ``task_metrics`` scheduler handler (see
+    ``get_task_metrics``) and as Prometheus text on the dashboard under
+    ``/metrics/tasks``.
+    """
+
+    name = "task-metrics"
+    idempotent = True
+
+    async def start(self, scheduler):
+        self._workers = {}
+        self._retired = {}
+        scheduler.stream_handlers[METRICS_OP] = self._receive
+        scheduler.handlers[METRICS_HANDLER] = self.query
+        http_application = getattr(scheduler, "http_application", None)
+        if http_application is not None:
+            http_application.add_handlers(r".*$", [(PROMETHEUS_ROUTE, _PrometheusHandler, {"aggregator": self})])
+
+    def _receive(self, worker=None, metrics=None):
+        self._workers[worker] = metrics
+
+    def remove_worker(self, scheduler, worker, **kwargs):
+        snapshot = self._workers.pop(worker, None)
+        if snapshot:
+            _merge(self._retired, snapshot)
+
+    def query(self, prefix=None) -> dict:
+        """Cluster-wide stats per task prefix, optionally only for one prefix"""
+        merged = {}
+        _merge(merged, self._retired)
+        for snapshot in self._workers.values():
+            _merge(merged, snapshot)
+        if prefix is not None:
+            merged = {prefix: merged[prefix]} if prefix in merged else {}
+        return summarize(merged)
+
+
+def task_metrics_plugins(interval=5.0):
+    """The scheduler and worker plugins to pass to ``client.register_plugin``, in order"""
+    return TaskMetricsAggregator(), TaskMetricsPlugin(interval=interval)
+
+
+def install_task_metrics(client, interval=5.0):
+    """Register the task metrics plugins on a synchronous client"""
+    for plugin in task_metrics_plugins(interval):
+        client.register_plugin(plugin)
+    logger.trace(f"Task metrics reported every {interval}s")
+
+
+def get_task_metrics(client, prefix=None) -> dict:
+    """Query the aggregated task metrics; returns a coroutine for an asynchronous client"""
+    return client.sync(client.scheduler.task_metrics, prefix=prefix)
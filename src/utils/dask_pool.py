@@ -0,0 +1,285 @@
+import asyncio
+import contextlib
+import threading
+import time
+from collections import deque
+
+from dask.distributed import WorkerPlugin, get_worker
+from loguru import logger
+
+# checkout 耗时超过该值（秒）才计为一次等待
+_WAIT_THRESHOLD = 0.001
+
+
+class PoolTimeoutError(TimeoutError):
+    """No connection became available within the checkout timeout"""
+
+
+class ResourcePool:
+    """Fixed-size pool of connections shared by the threads and coroutines of one process.
+
+    ``factory()`` opens a connection and ``closer(conn)`` closes one (``conn.close()``
+    by default). Slots whose connection failed or was discarded are reopened lazily on
+    checkout, waiting ``backoff`` seconds after a failed attempt and doubling the wait
+    up to ``max_backoff``. When ``health_check(conn)`` is given it runs on checkout for
+    connections idle longer than ``health_check_interval`` seconds; a connection that
+    fails it is closed and reopened.
+    """
+
+    def __init__(self, factory, size=4, *, closer=None, health_check=None, health_check_interval=0.0, backoff=0.1, max_backoff=30.0, name="pool"):  # noqa: PLR0913
+        self.name = name
+        self.size = size
+        self._factory = factory
+        self._closer = closer
+        self._health_check = health_check
+        self._health_check_interval = health_check_interval
+        self._base_backoff = backoff
+        self._max_backoff = max_backoff
+
+        self._cond = threading.Condition()
+        self._idle = deque()  # (conn, last_used)，后进先出，优先复用最热的连接
+        self._missing = size
+        self._backoff = 0.0
+        self._retry_at = 0.0
+        self._closed = False
+
+        self._in_use = 0
+        self._busy_since = time.monotonic()
+        self._busy_time = 0.0
+        self._created_at = time.monotonic()
+        self._counters = dict.fromkeys(("checkouts", "waits", "opened", "failures", "discarded", "health_failures"), 0)
+        self._wait_time = 0.0
+        self._peak_in_use = 0
+
+    def fill(self):
+        """Open every missing connection now instead of on first checkout"""
+        for _ in range(self._missing):
+            conn = self._open()
+            if conn is None:
+                break
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def _open(self):
+        with self._cond:
+            if self._missing <= 0 or self._closed:
+                return None
+            self._missing -= 1
+        try:
+            conn = self._factory()
+        except Exception as e:
+            with self._cond:
+                self._missing += 1
+                self._counters["failures"] += 1
+                self._backoff = min(self._max_backoff, self._backoff * 2 if self._backoff else self._base_backoff)
+                self._retry_at = time.monotonic() + self._backoff
+                self._cond.notify()
+            logger.warning(f"Pool {self.name}: opening a connection failed ({e}), retrying in {self._backoff:.2f}s")
+            return None
+        with self._cond:
+            self._counters["opened"] += 1
+            self._backoff = 0.0
+        return conn
+
+    def _close_conn(self, conn):
+        try:
+            if self._closer is not None:
+                self._closer(conn)
+            else:
+                conn.close()
+        except Exception as e:
+            logger.debug(f"Pool {self.name}: error closing connection: {e}")
+
+    def _account(self, delta):
+        # 调用方持有 self._cond；按“占用连接数 × 时间”累计忙碌时长
+        now = time.monotonic()
+        self._busy_time += (now - self._busy_since) * self._in_use
+        self._busy_since = now
+        self._in_use += delta
+
+    def _acquired(self, waited):
+        # 调用方持有 self._cond
+        self._account(1)
+        self._peak_in_use = max(self._peak_in_use, self._in_use)
+        self._counters["checkouts"] += 1
+        if waited > _WAIT_THRESHOLD:
+            self._counters["waits"] += 1
+            self._wait_time += waited
+
+    def _pop_idle(self):
+        """Non-blocking checkout of an idle connection that needs no health check, else None"""
+        with self._cond:
+            if not self._idle or self._closed:
+                return None
+            conn, last_used = self._idle[-1]
+            if self._health_check is not None and time.monotonic() - last_used >= self._health_check_interval:
+                return None
+            self._idle.pop()
+            self._acquired(0.0)
+            return conn
+
+    def checkout(self, timeout=30.0):
+        """Take a connection, blocking up to ``timeout`` seconds; pair with ``release``"""
+        start = time.monotonic()
+        deadline = start + timeout
+        while True:
+            conn = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise RuntimeError(f"Pool {self.name} is closed")
+                    now = time.monotonic()
+                    if self._idle:
+                        conn, last_used = self._idle.pop()
+                        break
+                    if self._missing > 0 and now >= self._retry_at:
+                        break
+                    if now >= deadline:
+                        raise PoolTimeoutError(f"No connection available in pool {self.name} after {timeout}s")
+                    wake = deadline if self._missing <= 0 else min(deadline, self._retry_at)
+                    self._cond.wait(wake - now)
+
+            if conn is not None and self._health_check is not None and time.monotonic() - last_used >= self._health_check_interval and not self._check(conn):
+                with self._cond:
+                    self._counters["health_failures"] += 1
+                self._discard(conn)
+                conn = None
+            if conn is None:
+                conn = self._open()
+                if conn is None:
+                    continue
+            with self._cond:
+                self._acquired(time.monotonic() - start)
+            return conn
+
+    def _check(self, conn):
+        try:
+            return bool(self._health_check(conn))
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        self._close_conn(conn)
+        with self._cond:
+            self._missing += 1
+            self._counters["discarded"] += 1
+            self._cond.notify()
+
+    def release(self, conn, discard=False):
+        """Give a connection back; ``discard=True`` closes it and frees the slot for a new one"""
+        with self._cond:
+            self._account(-1)
+        if discard or self._closed:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextlib.contextmanager
+    def connection(self, timeout=30.0):
+        """``with pool.connection() as conn:``; connections that raised OSError are discarded"""
+        conn = self.checkout(timeout)
+        try:
+            yield conn
+        except OSError:
+            self.release(conn, discard=True)
+            raise
+        except BaseException:
+            self.release(conn)
+            raise
+        self.release(conn)
+
+    @contextlib.asynccontextmanager
+    async def aconnection(self, timeout=30.0):
+        """Async variant of ``connection``; waits in a thread only when no connection is idle"""
+        conn = self._pop_idle()
+        if conn is None:
+            conn = await asyncio.to_thread(self.checkout, timeout)
+        try:
+            yield conn
+        except OSError:
+            self.release(conn, discard=True)
+            raise
+        except BaseException:
+            self.release(conn)
+            raise
+        self.release(conn)
+
+    def stats(self) -> dict:
+        """Counters and utilization (average share of connections checked out) since creation"""
+        with self._cond:
+            now = time.monotonic()
+            busy = self._busy_time + (now - self._busy_since) * self._in_use
+            elapsed = now - self._created_at
+            return {
+                "name": self.name,
+                "size": self.size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "missing": self._missing,
+                "peak_in_use": self._peak_in_use,
+                "utilization": busy / (elapsed * self.size) if elapsed and self.size else 0.0,
+                "wait_seconds": self._wait_time,
+                **self._counters,
+            }
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close_conn(conn)
+
+
+class PooledResourcePlugin(WorkerPlugin):
+    """Open a ``ResourcePool`` of ``size`` connections on every worker.
+
+    Tasks get it with ``get_pool(name)`` and use ``pool.connection()`` from worker
+    threads or ``pool.aconnection()`` from ``async def`` tasks. ``factory`` and the
+    other callables are pickled to the workers, so they must be importable there.
+    """
+
+    idempotent = True
+
+    def __init__(self, name, factory, size=4, *, closer=None, health_check=None, health_check_interval=0.0, backoff=0.1, max_backoff=30.0):  # noqa: PLR0913
+        self.name = f"pool-{name}"
+        self.pool_name = name
+        self.factory = factory
+        self.size = size
+        self.options = {
+            "closer": closer,
+            "health_check": health_check,
+            "health_check_interval": health_check_interval,
+            "backoff": backoff,
+            "max_backoff": max_backoff,
+        }
+
+    def setup(self, worker):
+        self.pool = ResourcePool(self.factory, self.size, name=self.pool_name, **self.options)
+        # 启动时连不上也不影响 worker，之后在 checkout 时按退避重连
+        self.pool.fill()
+        logger.debug(f"Pool {self.pool_name} on {worker.address}: {self.size - self.pool.stats()['missing']}/{self.size} connections open")
+
+    def teardown(self, worker):
+        self.pool.close()
+
+
+def get_pool(name, worker=None) -> ResourcePool:
+    """Return the pool registered as ``name`` on the worker running the current task"""
+    worker = worker or get_worker()
+    try:
+        return worker.plugins[f"pool-{name}"].pool
+    except KeyError:
+        raise KeyError(f"No pool {name!r} on worker {worker.address}; register a PooledResourcePlugin first") from None
+
+
+def get_pool_stats(client, name) -> dict:
+    """Per-worker ``ResourcePool.stats()`` of pool ``name``, keyed by worker address"""
+    return client.run(_pool_stats, name)
+
+
+def _pool_stats(name, dask_worker):
+    return get_pool(name, dask_worker).stats()
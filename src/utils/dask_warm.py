@@ -0,0 +1,77 @@
+import contextlib
+import ctypes
+import gc
+import socket
+import sys
+import time
+
+import click
+from loguru import logger
+
+from .config import Config
+from .dask_affinity import clear_local_state
+
+
+def scheduler_listening(port, host="127.0.0.1", timeout=0.2) -> bool:
+    """Whether something accepts TCP connections on ``host:port``"""
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def _trim_memory():
+    # glibc 不会主动把释放的小块内存还给系统，会话之间手动归还
+    if not sys.platform.startswith("linux"):
+        return False
+    try:
+        return bool(ctypes.CDLL("libc.so.6").malloc_trim(0))
+    except (OSError, AttributeError):
+        return False
+
+
+def reset_worker_state(dask_worker) -> dict:
+    """Forget what earlier sessions left on a worker while keeping the process and its imports.
+
+    Run through ``client.run`` when a session starts on warm workers. Task results are
+    already released by the scheduler once their client is gone; this drops the
+    ``local_state`` caches, collects garbage and returns freed heap memory to the OS.
+    Worker plugins such as connection pools stay, they are meant to be reused.
+    """
+    return {
+        "local_states": clear_local_state(dask_worker),
+        "gc_collected": gc.collect(),
+        "trimmed": _trim_memory(),
+        "data": len(dask_worker.data),
+    }
+
+
+@click.command("serve")
+def serve_command():
+    """Run a long-lived local cluster on cluster.scheduler_port for other processes to attach to."""
+    from dask.distributed import LocalCluster  # noqa: PLC0415
+
+    from .dask import DaskClientSingleton  # noqa: PLC0415
+    from .dask_adaptive import AppAdaptive, adaptive_options  # noqa: PLC0415
+
+    cluster_config = Config().get_config()["cluster"]
+    options = DaskClientSingleton._cluster_options(cluster_config)
+    if scheduler_listening(options["scheduler_port"]):
+        raise click.ClickException(f"Port {options['scheduler_port']} is already in use")
+
+    # worker 插件（日志转发、任务指标等）由连接进来的进程注册，同名插件重复注册时只是替换
+    with LocalCluster(**options) as cluster, cluster.get_client() as client:
+        client.wait_for_workers(options["n_workers"])
+        adaptive = cluster_config.get("adaptive") or {}
+        if adaptive.get("enabled"):
+            cluster.adapt(Adaptive=AppAdaptive, **adaptive_options(adaptive))
+        logger.info(f"Warm Dask cluster with {options['n_workers']} workers listening on {cluster.scheduler_address}, press Ctrl+C to stop")
+        with contextlib.suppress(KeyboardInterrupt):
+            while cluster.status.name == "running":
+                time.sleep(1)
+    logger.info("Warm Dask cluster stopped")
+
+
+if __name__ == "__main__":
+    serve_command()
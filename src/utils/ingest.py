@@ -0,0 +1,399 @@
+import asyncio
+import contextvars
+import json
+import time
+from http import HTTPStatus
+
+from loguru import logger
+
+from .log_scope import get_context, log_context, new_request_id
+from .log_sink import parse_size
+from .profiling import span
+
+# 可以通过 HTTP 提交的任务：名字 -> func(payload)，在 worker 上逐个处理批次里的 payload
+TASKS = {}
+
+
+def task(name=None):
+    """Register ``func(payload)`` under ``name`` (default: the function name) as a task the service accepts"""
+
+    def decorator(func):
+        TASKS[name or func.__name__] = func
+        return func
+
+    return decorator
+
+
+@task()
+def echo(payload):
+    return payload
+
+
+@task()
+def sleep(payload):
+    """Sleep ``payload["seconds"]`` and return the payload, a stand-in for I/O-bound work"""
+    time.sleep(payload.get("seconds", 0.0))
+    return payload
+
+
+def run_batch(func, payloads, contexts=None):
+    """Run ``func`` over one micro-batch; ``(True, result)`` or ``(False, error)`` per payload.
+
+    ``contexts`` holds the log context of the request each payload came from, so the
+    job's log records carry that request's ``request_id``.
+    """
+    results = []
+    for payload, context in zip(payloads, contexts or [{}] * len(payloads), strict=True):
+        with log_context(**context):
+            try:
+                results.append((True, func(payload)))
+            except Exception as e:
+                results.append((False, {"type": type(e).__name__, "message": str(e)}))
+    return results
+
+
+def dask_submitter(client):
+    """``submit(func, payloads)`` sending one ``run_batch`` task per batch to a synchronous Dask client.
+
+    The returned asyncio future is resolved from the Dask callback thread, so waiting
+    for the cluster never blocks the event loop.
+    """
+    loop = asyncio.get_running_loop()
+
+    def submit(func, payloads, contexts):
+        result = loop.create_future()
+
+        def done(future):
+            # Dask 在单独的线程中执行回调，这里取结果不会阻塞事件循环
+            try:
+                loop.call_soon_threadsafe(_resolve, result, future.result(), None)
+            except Exception as e:
+                loop.call_soon_threadsafe(_resolve, result, None, e)
+
+        client.submit(run_batch, func, payloads, contexts, pure=False).add_done_callback(done)
+        return result
+
+    return submit
+
+
+def local_submitter(executor=None):
+    """``submit(func, payloads)`` running batches in ``executor`` (default: the loop's thread pool)"""
+    loop = asyncio.get_running_loop()
+
+    def submit(func, payloads, contexts):
+        # run_in_executor 不传递 contextvars，批次的日志上下文要显式带过去
+        return loop.run_in_executor(executor, contextvars.copy_context().run, run_batch, func, payloads, contexts)
+
+    return submit
+
+
+def _resolve(future, value, error):
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(value)
+
+
+class MicroBatcher:
+    """Groups jobs for the same task into one submission of up to ``max_size`` jobs.
+
+    The timer starts with the first job of a batch, so under light load a job waits at
+    most ``max_delay`` seconds before it is sent; under heavy load batches fill up and go
+    out at once. ``max_size=1`` or ``max_delay=0`` submits every job on its own.
+    """
+
+    def __init__(self, submit, max_size=64, max_delay=0.005):
+        self._submit = submit
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self._pending = {}  # 任务名 -> [(payload, future, 日志上下文)]
+        self._timers = {}
+        self._running = set()
+        self.batches = 0
+        self.jobs = 0
+
+    def put(self, name, payload) -> asyncio.Future:
+        """Queue one job; the future resolves to ``(ok, result_or_error)``"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(name, [])
+        pending.append((payload, future, get_context()))
+        if len(pending) >= self.max_size or self.max_delay <= 0:
+            self._flush(name)
+        elif len(pending) == 1:
+            self._timers[name] = loop.call_later(self.max_delay, self._flush, name)
+        return future
+
+    def _flush(self, name):
+        timer = self._timers.pop(name, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(name, None)
+        if not batch:
+            return
+        self.batches += 1
+        self.jobs += len(batch)
+        # 批次属于多个请求，不继承触发它的那个请求的上下文
+        running = asyncio.get_running_loop().create_task(self._run(name, batch, f"{name}-{self.batches}"), context=contextvars.Context())
+        self._running.add(running)
+        running.add_done_callback(self._running.discard)
+
+    async def _run(self, name, batch, batch_id):
+        with log_context(batch_id=batch_id):
+            logger.debug(f"Submitting {len(batch)} {name} jobs")
+            try:
+                results = await self._submit(TASKS[name], [job[0] for job in batch], [job[2] for job in batch])
+            except Exception as e:
+                # 整批失败（worker 崩溃、序列化失败等）时每个任务都得到同样的错误
+                results = [(False, {"type": type(e).__name__, "message": str(e)})] * len(batch)
+        for (_, future, _), result in zip(batch, results, strict=True):
+            if not future.done():
+                future.set_result(result)
+
+    async def drain(self):
+        """Send whatever is still queued and wait for every batch in flight"""
+        for name in list(self._pending):
+            self._flush(name)
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message=None):
+        super().__init__(message or HTTPStatus(status).phrase)
+        self.status = status
+
+
+def _head(status, content_type="application/json", length=None, headers=()):
+    status = HTTPStatus(status)
+    lines = [f"HTTP/1.1 {status.value} {status.phrase}", f"Content-Type: {content_type}"]
+    lines.append(f"Content-Length: {length}" if length is not None else "Transfer-Encoding: chunked")
+    request_id = get_context().get("request_id")
+    if request_id is not None:
+        lines.append(f"X-Request-ID: {request_id}")
+    lines.extend(headers)
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+def _json_response(status, data, headers=()):
+    body = json.dumps(data, default=str).encode()
+    return _head(status, length=len(body), headers=headers) + body
+
+
+def _chunk(data):
+    return f"{len(data):x}\r\n".encode() + data + b"\r\n"
+
+
+async def _readline(reader, status):
+    try:
+        return await reader.readline()
+    except ValueError:
+        # 行长超过 StreamReader 的上限（默认 64 KiB）；readline 把 LimitOverrunError 转成了 ValueError
+        raise HTTPError(status) from None
+
+
+async def _read_request(reader, max_body_size):
+    """``(method, path, headers, body)`` of the next request on the connection, None once it is closed"""
+    line = await _readline(reader, HTTPStatus.BAD_REQUEST)
+    if not line.strip():
+        return None
+    try:
+        method, path, version = line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line") from None
+    headers = {"version": version}
+    while (line := await _readline(reader, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE)) not in {b"\r\n", b"\n", b""}:
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    if "chunked" in headers.get("transfer-encoding", ""):
+        raise HTTPError(HTTPStatus.LENGTH_REQUIRED, "Chunked request bodies are not supported")
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length") from None
+    if length > max_body_size:
+        raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+    return method, path.split("?", 1)[0], headers, await reader.readexactly(length)
+
+
+def _keep_alive(headers):
+    connection = headers.get("connection", "").lower()
+    if headers["version"] == "HTTP/1.0":
+        return connection == "keep-alive"
+    return connection != "close"
+
+
+class IngestService:
+    """Asyncio HTTP/1.1 service that accepts jobs and runs them in micro-batches.
+
+    ``POST /jobs`` with ``{"task": name, "payload": ...}`` answers ``{"result": ...}``
+    once the job is done (500 with ``{"error": ...}`` if it raised). With
+    ``"payloads": [...]`` the answer is streamed as chunked NDJSON, one
+    ``{"index": i, "result" | "error": ...}`` line per job in completion order.
+    ``GET /health`` returns the counters. Jobs that would push the number of accepted,
+    unfinished jobs over ``max_in_flight`` are rejected with 429 and ``Retry-After``.
+    """
+
+    def __init__(self, submit, host="0.0.0.0", port=13000, max_in_flight=10000, batch_size=64, batch_delay=0.005, max_body_size=16 * 1000**2):  # noqa: PLR0913, PLR0917
+        self.batcher = MicroBatcher(submit, batch_size, batch_delay)
+        self.host = host
+        self.port = port
+        self.max_in_flight = max_in_flight
+        self.max_body_size = max_body_size
+        self.in_flight = 0
+        self.requests = 0
+        self.rejected = 0
+        self._server = None
+        self._connections = set()
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "requests": self.requests,
+            "rejected": self.rejected,
+            "jobs": self.batcher.jobs,
+            "batches": self.batcher.batches,
+        }
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        # port 为 0 时由系统分配，记下实际端口
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Ingestion service listening on http://{self.host}:{self.port}")
+
+    async def close(self):
+        """Stop accepting connections, finish the queued batches and drop idle connections"""
+        if self._server is not None:
+            self._server.close()
+        await self.batcher.drain()
+        for writer in list(self._connections):
+            writer.close()
+        if self._server is not None:
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader, writer):
+        self._connections.add(writer)
+        try:
+            while (request := await _read_request(reader, self.max_body_size)) is not None:
+                method, path, headers, body = request
+                self.requests += 1
+                # 请求及其任务（包括 worker 上）的日志都带上这个 request_id
+                with log_context(request_id=headers.get("x-request-id") or new_request_id()):
+                    await self._dispatch(method, path, body, writer)
+                await writer.drain()
+                if not _keep_alive(headers):
+                    break
+        except HTTPError as e:
+            writer.write(_json_response(e.status, {"error": str(e)}, headers=("Connection: close",)))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    async def _dispatch(self, method, path, body, writer):
+        if path == "/health":
+            if method != "GET":
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED)
+            writer.write(_json_response(HTTPStatus.OK, self.stats))
+        elif path == "/jobs":
+            if method != "POST":
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED)
+            await self._submit(body, writer)
+        else:
+            writer.write(_json_response(HTTPStatus.NOT_FOUND, {"error": f"No route for {path}"}))
+
+    def _admit(self, name, payloads):
+        """Queue the jobs, or None when they would exceed ``max_in_flight``"""
+        if self.in_flight + len(payloads) > self.max_in_flight:
+            self.rejected += 1
+            return None
+        self.in_flight += len(payloads)
+        futures = [self.batcher.put(name, payload) for payload in payloads]
+        for future in futures:
+            # 客户端断开也要等任务真正结束才释放名额，集群上的工作并没有停
+            future.add_done_callback(self._release)
+        return futures
+
+    def _release(self, _future):
+        self.in_flight -= 1
+
+    async def _submit(self, body, writer):
+        try:
+            job = json.loads(body)
+        except ValueError as e:
+            writer.write(_json_response(HTTPStatus.BAD_REQUEST, {"error": f"Invalid JSON: {e}"}))
+            return
+        name = job.get("task") if isinstance(job, dict) else None
+        if name not in TASKS:
+            writer.write(_json_response(HTTPStatus.NOT_FOUND, {"error": f"Unknown task {name!r}, expected one of {sorted(TASKS)}"}))
+            return
+        streaming = isinstance(job.get("payloads"), list)
+        futures = self._admit(name, job["payloads"] if streaming else [job.get("payload")])
+        if futures is None:
+            writer.write(_json_response(HTTPStatus.TOO_MANY_REQUESTS, {"error": "Too many jobs in flight", "in_flight": self.in_flight}, headers=("Retry-After: 1",)))
+        elif streaming:
+            await self._stream(futures, writer)
+        else:
+            ok, value = await futures[0]
+            writer.write(_json_response(HTTPStatus.OK, {"result": value}) if ok else _json_response(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": value}))
+
+    @staticmethod
+    async def _stream(futures, writer):
+        writer.write(_head(HTTPStatus.OK, "application/x-ndjson"))
+        index = {future: i for i, future in enumerate(futures)}
+        pending = set(futures)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            lines = []
+            for future in sorted(done, key=index.get):
+                ok, value = future.result()
+                lines.append(json.dumps({"index": index[future], "result" if ok else "error": value}, default=str).encode() + b"\n")
+            writer.write(_chunk(b"".join(lines)))
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+
+
+async def serve_ingest(http_config, client=None):
+    """Run the ingestion service described by the ``http`` config section until cancelled.
+
+    With ``backend: dask`` batches go to ``client`` or, by default, the shared client
+    from ``get_dask_client()``; ``local`` or an unavailable cluster runs them in this
+    process's thread pool.
+    """
+    owns_client = False
+    if client is None and http_config.get("backend", "dask") == "dask":
+        with span("cluster"):
+            from .dask import DaskClientSingleton, get_dask_client  # noqa: PLC0415
+
+            # 集群启动需要几秒，放到线程里以免阻塞事件循环
+            client = await asyncio.to_thread(get_dask_client)
+        owns_client = client is not None
+        if client is None:
+            logger.warning("Dask client is not available, running jobs in a local thread pool")
+    batch = http_config.get("batch") or {}
+    max_body_size = http_config.get("max_body_size", "16 MB")
+    service = IngestService(
+        dask_submitter(client) if client is not None else local_submitter(),
+        host=http_config.get("host", "0.0.0.0"),
+        port=http_config.get("port", 13000),
+        max_in_flight=http_config.get("max_in_flight", 10000),
+        batch_size=batch.get("max_size", 64),
+        batch_delay=batch.get("max_delay", 0.005),
+        max_body_size=parse_size(max_body_size) if isinstance(max_body_size, str) else max_body_size,
+    )
+    await service.start()
+    try:
+        with span("workload"):
+            await asyncio.Event().wait()
+    finally:
+        with span("shutdown"):
+            await service.close()
+            logger.info(f"Ingestion service stopped: {service.stats}")
+            if owns_client:
+                await DaskClientSingleton.close()
@@ -0,0 +1,160 @@
+import threading
+import time
+
+from loguru import logger
+
+
+class SamplingRule:
+    """How many records a single call site may emit per window.
+
+    ``first``/``every``: emit the first N records of each window, then one in M.
+    ``rate``/``burst``: token bucket refilled at ``rate`` records per second.
+    Both can be combined; a record must pass both to be emitted.
+    """
+
+    __slots__ = ("first", "every", "rate", "burst")
+
+    def __init__(self, first=None, every=None, rate=None, burst=None):
+        self.first = first
+        self.every = every
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+
+    @classmethod
+    def from_config(cls, config: dict):
+        return cls(
+            first=config.get("first"),
+            every=config.get("every"),
+            rate=config.get("rate"),
+            burst=config.get("burst"),
+        )
+
+
+class _SiteState:
+    __slots__ = ("rule", "seen", "suppressed", "tokens", "refilled_at", "level")
+
+    def __init__(self, rule, now):
+        self.rule = rule
+        self.seen = 0
+        self.suppressed = 0
+        self.tokens = rule.burst if rule.rate is not None else 0.0
+        self.refilled_at = now
+        self.level = "INFO"
+
+
+class LogSampler:
+    """Per-call-site sampling and rate limiting for loguru records.
+
+    Rules are looked up by ``"module:function:line"``, then ``"module:function"``,
+    then the longest matching dotted module prefix, then ``default``. The resolved
+    rule is cached per call site. Every ``summary_interval`` seconds a background
+    thread logs one "suppressed K messages" record per call site that dropped
+    anything, attributed to that call site, and the first-N window starts over.
+    """
+
+    def __init__(self, rules: dict | None = None, default: dict | None = None, summary_interval: float = 60.0):
+        self._rules = {key: SamplingRule.from_config(value) for key, value in (rules or {}).items()}
+        self._default = SamplingRule.from_config(default) if default else None
+        self._summary_interval = float(summary_interval)
+        self._sites = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _resolve(self, name, function, line):
+        rules = self._rules
+        for key in (f"{name}:{function}:{line}", f"{name}:{function}"):
+            if key in rules:
+                return rules[key]
+        parts = name.split(".")
+        for i in range(len(parts), 0, -1):
+            rule = rules.get(".".join(parts[:i]))
+            if rule is not None:
+                return rule
+        return self._default
+
+    def allow(self, record) -> bool:
+        """Return False if the record's call site is over its budget"""
+        if "sampling_summary" in record["extra"]:
+            return True
+
+        name = record["name"] or ""
+        site_key = (name, record["function"], record["line"])
+        state = self._sites.get(site_key)
+        if state is None:
+            rule = self._resolve(*site_key)
+            if rule is None:
+                # 没有规则的调用点也缓存下来，后续只需一次字典查找
+                self._sites[site_key] = False
+                return True
+            state = self._sites.setdefault(site_key, _SiteState(rule, time.monotonic()))
+        elif state is False:
+            return True
+
+        with self._lock:
+            allowed = self._check(state)
+            if not allowed:
+                state.suppressed += 1
+                state.level = record["level"].name
+        if not allowed and self._thread is None:
+            self._start_reporter()
+        return allowed
+
+    @staticmethod
+    def _check(state):
+        rule = state.rule
+        state.seen += 1
+        if rule.first is not None and state.seen > rule.first:
+            if not rule.every or (state.seen - rule.first) % rule.every:
+                return False
+        elif rule.first is None and rule.every and (state.seen - 1) % rule.every:
+            return False
+
+        if rule.rate is not None:
+            now = time.monotonic()
+            state.tokens = min(rule.burst, state.tokens + (now - state.refilled_at) * rule.rate)
+            state.refilled_at = now
+            if state.tokens < 1:
+                return False
+            state.tokens -= 1
+        return True
+
+    def _start_reporter(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._report_loop, name="log-sampling-summary", daemon=True)
+            self._thread.start()
+
+    def _report_loop(self):
+        while not self._stop.wait(self._summary_interval):
+            self.flush_summaries()
+
+    def flush_summaries(self):
+        """Log the suppressed counts collected so far and reset the per-site windows"""
+        pending = []
+        with self._lock:
+            for (name, function, line), state in self._sites.items():
+                if state is False:
+                    continue
+                if state.suppressed:
+                    pending.append((name, function, line, state.level, state.suppressed))
+                state.seen = 0
+                state.suppressed = 0
+
+        for name, function, line, level, suppressed in pending:
+
+            def _at_site(record, name=name, function=function, line=line):
+                record.update(name=name, function=function, line=line)
+
+            logger.patch(_at_site).bind(sampling_summary=True).log(
+                level,
+                f"Suppressed {suppressed} messages from {name}:{function}:{line} in the last {self._summary_interval:g}s",
+            )
+
+    def stop(self):
+        """Stop the reporter thread and emit the final summaries"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush_summaries()
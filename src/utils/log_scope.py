@@ -0,0 +1,59 @@
+import contextlib
+import contextvars
+import uuid
+from functools import cache
+from types import MappingProxyType
+
+# 当前协程/线程的日志上下文。值只整体替换、从不原地修改，读取时无需复制
+_context = contextvars.ContextVar("log_context", default=MappingProxyType({}))
+
+
+def get_context():
+    """The current log context; treat it as read-only"""
+    return _context.get()
+
+
+@contextlib.contextmanager
+def log_context(**fields):
+    """Add ``fields`` (e.g. ``request_id``) to every record logged in the block, including by tasks it submits"""
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def _patch(record):
+    context = _context.get()
+    if context:
+        extra = record["extra"]
+        for key, value in context.items():
+            # 显式 bind 的值优先，bind 的 None 占位由上下文补上
+            if extra.get(key) is None:
+                extra[key] = value
+
+
+@cache
+def install_log_context():
+    """Copy the log context into every loguru record's ``extra``, once per process.
+
+    The patcher runs only for records that pass the level check, and costs one
+    ``ContextVar.get`` when no context is set.
+    """
+    from loguru import logger  # noqa: PLC0415
+
+    logger.configure(patcher=_patch)
+
+
+def run_in_context(context, func, /, *args, **kwargs):
+    """Task wrapper: run ``func`` on the worker with the submitter's log ``context`` restored"""
+    install_log_context()
+    token = _context.set(context)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _context.reset(token)
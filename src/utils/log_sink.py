@@ -0,0 +1,402 @@
+import contextlib
+import glob
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from datetime import time as dtime
+
+_SIZE_UNITS = {"b": 1, "kb": 1000, "mb": 1000**2, "gb": 1000**3, "kib": 1024, "mib": 1024**2, "gib": 1024**3}
+_DURATION_UNITS = {
+    "s": 1,
+    "second": 1,
+    "m": 60,
+    "minute": 60,
+    "h": 3600,
+    "hour": 3600,
+    "d": 86400,
+    "day": 86400,
+    "w": 7 * 86400,
+    "week": 7 * 86400,
+    "month": 30 * 86400,
+    "y": 365 * 86400,
+    "year": 365 * 86400,
+}
+_QUANTITY_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([a-zA-Z]+)\s*$")
+_DAYTIME_RE = re.compile(r"^(.*?)\s+at\s+(.*)$", re.IGNORECASE)
+_WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+_TIME_FORMATS = ("%H", "%H:%M", "%H:%M:%S", "%H:%M:%S.%f", "%I %p", "%I:%M %p", "%I:%M:%S %p", "%I:%M:%S.%f %p")
+
+# writev 单次最多接受的缓冲区数量
+_IOV_MAX = os.sysconf("SC_IOV_MAX") if hasattr(os, "sysconf") and "SC_IOV_MAX" in os.sysconf_names else 1024
+
+POLICIES = ("block", "drop_oldest", "drop_new")
+
+
+def _parse_quantity(text, units):
+    match = _QUANTITY_RE.match(str(text))
+    if not match:
+        return None
+    value, unit = match.groups()
+    unit = unit.lower()
+    if unit not in units and unit.endswith("s"):
+        unit = unit[:-1]
+    if unit not in units:
+        return None
+    return float(value) * units[unit]
+
+
+def parse_size(text):
+    """Parse a loguru-style size such as "500 MB" into bytes, or None if it is not a size"""
+    size = _parse_quantity(text, _SIZE_UNITS)
+    return None if size is None else int(size)
+
+
+def parse_duration(text):
+    """Parse a loguru-style duration such as "1 days" into seconds, or None if it is not a duration"""
+    return _parse_quantity(text, _DURATION_UNITS)
+
+
+def _start_of_day(moment):
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(moment):
+    first = _start_of_day(moment).replace(day=1)
+    years, month = divmod(first.month, 12)
+    return first.replace(year=first.year + years, month=month + 1)
+
+
+# loguru 的周期写法：在下一个周期开始时轮转，而不是从文件创建起计时
+_FREQUENCIES = {
+    "hourly": lambda moment: moment.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1),
+    "daily": lambda moment: _start_of_day(moment) + timedelta(days=1),
+    "weekly": lambda moment: _start_of_day(moment) + timedelta(days=7 - moment.weekday()),
+    "monthly": _next_month,
+    "yearly": lambda moment: _start_of_day(moment).replace(month=1, day=1, year=moment.year + 1),
+}
+
+
+def _parse_time_of_day(text):
+    for fmt in _TIME_FORMATS:
+        try:
+            return datetime.strptime(text.strip(), fmt).time()
+        except ValueError:
+            continue
+    return None
+
+
+def _parse_weekday(text):
+    day = text.strip().lower()
+    if day in _WEEKDAYS:
+        return _WEEKDAYS.index(day)
+    return int(day[1]) if re.fullmatch(r"w[0-6]", day) else None
+
+
+def _at_time(at, every=None, weekday=None):
+    """Next-rotation function for a time of day, on ``weekday`` only or every ``every`` seconds"""
+
+    def next_rotation(moment):
+        candidate = datetime.combine(moment.date(), at)
+        if weekday is not None:
+            candidate += timedelta(days=(weekday - moment.weekday()) % 7)
+        step = timedelta(days=7 if weekday is not None else 1) if every is None else timedelta(seconds=every)
+        while candidate <= moment:
+            candidate += step
+        return candidate
+
+    return next_rotation
+
+
+def parse_rotation(text):
+    """Parse a loguru-style rotation string into ``(max_size, next_rotation)``.
+
+    Exactly one of the two is set: the size limit in bytes, or a function mapping the
+    (naive, local) time a file was opened to the time it must be rotated. Accepted forms
+    are sizes ("500 MB"), durations ("1 day"), frequencies ("daily", "weekly", ...),
+    times of day ("00:00", "1 PM"), weekdays ("sunday", "w0"), a weekday or a duration
+    at a time ("monday at 12:00", "1 day at 12:00"). Returns None for anything else.
+    """
+    text = str(text)
+    size = parse_size(text)
+    if size is not None:
+        return size, None
+    next_rotation = _parse_schedule(text)
+    return None if next_rotation is None else (None, next_rotation)
+
+
+def _parse_schedule(text):
+    interval = parse_duration(text)
+    if interval is not None:
+        return lambda moment: moment + timedelta(seconds=interval)
+    frequency = _FREQUENCIES.get(text.strip().lower())
+    if frequency is not None:
+        return frequency
+    match = _DAYTIME_RE.match(text.strip())
+    if match:
+        return _parse_daytime(*match.groups())
+    weekday = _parse_weekday(text)
+    if weekday is not None:
+        return _at_time(dtime(0), weekday=weekday)
+    at = _parse_time_of_day(text)
+    return None if at is None else _at_time(at)
+
+
+def _parse_daytime(day, at):
+    """``"<weekday or duration> at <time>"``"""
+    at = _parse_time_of_day(at)
+    if at is None:
+        return None
+    weekday = _parse_weekday(day)
+    if weekday is not None:
+        return _at_time(at, weekday=weekday)
+    every = parse_duration(day)
+    return None if every is None else _at_time(at, every=every)
+
+
+def write_chunks(fd, chunks):
+    """Write all chunks to fd, using one writev call per IOV_MAX buffers where available"""
+    if not hasattr(os, "writev"):
+        data = b"".join(chunks)
+        while data:
+            data = data[os.write(fd, data) :]
+        return
+
+    for start in range(0, len(chunks), _IOV_MAX):
+        batch = chunks[start : start + _IOV_MAX]
+        remaining = sum(len(c) for c in batch)
+        written = os.writev(fd, batch)
+        if written < remaining:
+            # 部分写入（磁盘满或管道被填满）时退回到逐段写入剩余部分
+            data = b"".join(batch)[written:]
+            while data:
+                data = data[os.write(fd, data) :]
+
+
+class StreamTarget:
+    """Batch target writing straight to the file descriptor behind a text stream"""
+
+    def __init__(self, stream=None):
+        self._stream = stream or sys.stdout
+        try:
+            self._fd = self._stream.fileno()
+        except (AttributeError, OSError, ValueError):
+            # 被测试框架等替换过的 stdout 没有真实的文件描述符
+            self._fd = None
+
+    def write_batch(self, chunks):
+        if self._fd is None:
+            self._stream.write(b"".join(chunks).decode("utf-8"))
+            self._stream.flush()
+            return
+        # 先冲掉 Python 层的缓冲，保持与 print 等输出的先后顺序
+        self._stream.flush()
+        write_chunks(self._fd, chunks)
+
+    def close(self):
+        pass
+
+
+class RotatingFile:
+    """Append-only log file with loguru-compatible rotation (see ``parse_rotation``) and retention.
+
+    Rotated files are renamed to ``<stem>.<YYYY-MM-DD_HH-MM-SS_ffffff><ext>`` like loguru
+    does, so files produced by either sink are retained by the same rules. ``on_rotate``
+    is called with the rotated path right after the rename, and files named
+    ``<rotated path><suffix>`` for each of ``sidecars`` are removed together with it.
+    """
+
+    def __init__(self, path, rotation=None, retention=None, on_rotate=None, sidecars=()):  # noqa: PLR0913
+        self.path = os.path.abspath(path)
+        self._on_rotate = on_rotate
+        self._sidecars = tuple(sidecars)
+        parsed = parse_rotation(rotation) if rotation is not None else (None, None)
+        if parsed is None:
+            raise ValueError(f'Unsupported rotation for batched file sink: {rotation!r}; use a size, a duration, hourly/daily/weekly/monthly/yearly, a time of day, a weekday or "<weekday or duration> at <time>"')
+        self._max_size, self._next_rotation = parsed
+
+        if retention is None or isinstance(retention, int):
+            self._retention_count, self._retention_age = retention, None
+        else:
+            self._retention_count, self._retention_age = None, parse_duration(retention)
+            if self._retention_age is None:
+                raise ValueError(f"Unsupported retention for batched file sink: {retention!r}")
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._fd = None
+        self._size = 0
+        self._rotate_at = None
+        self._open()
+
+    def _open(self):
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        stat = os.fstat(self._fd)
+        self._size = stat.st_size
+        if self._next_rotation is not None:
+            # 有创建时间的平台按创建时间计算轮转周期，否则从打开时开始计时
+            opened_at = getattr(stat, "st_birthtime", None) or time.time()
+            self._rotate_at = self._next_rotation(datetime.fromtimestamp(opened_at)).timestamp()
+
+    def _should_rotate(self, incoming):
+        if self._max_size is not None:
+            return self._size > 0 and self._size + incoming > self._max_size
+        if self._rotate_at is not None:
+            return time.time() >= self._rotate_at
+        return False
+
+    def rotate(self):
+        """Close the current file, rename it with a timestamp and open a fresh one"""
+        os.close(self._fd)
+        stem, ext = os.path.splitext(self.path)
+        stamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S_%f")
+        rotated = f"{stem}.{stamp}{ext}"
+        os.replace(self.path, rotated)
+        if self._on_rotate is not None:
+            self._on_rotate(rotated)
+        self._open()
+        self._apply_retention()
+        return rotated
+
+    def rotated_files(self):
+        """Return rotated siblings of the active file, oldest first"""
+        stem, ext = os.path.splitext(self.path)
+        return sorted(glob.glob(f"{glob.escape(stem)}.*{ext}"), key=os.path.getmtime)
+
+    def _apply_retention(self):
+        files = self.rotated_files()
+        if self._retention_count is not None:
+            expired = files[: max(0, len(files) - self._retention_count)]
+        elif self._retention_age is not None:
+            deadline = time.time() - self._retention_age
+            expired = [f for f in files if os.path.getmtime(f) < deadline]
+        else:
+            return
+        for path in expired:
+            for victim in (path, *(path + suffix for suffix in self._sidecars)):
+                with contextlib.suppress(OSError):
+                    os.remove(victim)
+
+    @property
+    def size(self) -> int:
+        """Bytes written to the active file, i.e. the offset of the next write"""
+        return self._size
+
+    def write_batch(self, chunks):
+        incoming = sum(len(c) for c in chunks)
+        if self._should_rotate(incoming):
+            self.rotate()
+        write_chunks(self._fd, chunks)
+        self._size += incoming
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class BatchingSink:
+    """Loguru sink buffering messages in a bounded ring and flushing them in batches.
+
+    A background thread writes the buffer to ``target`` whenever ``batch_size`` messages
+    are pending or ``flush_interval`` seconds have passed, using one vectored write per
+    batch. When the buffer holds ``capacity`` messages the ``policy`` decides what
+    happens: ``block`` waits for the writer, ``drop_oldest`` evicts the oldest pending
+    message and ``drop_new`` discards the incoming one.
+    """
+
+    def __init__(self, target, capacity=10000, batch_size=512, flush_interval=0.5, policy="block"):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown backpressure policy {policy!r}, expected one of {POLICIES}")
+        self._target = target
+        self._capacity = max(1, int(capacity))
+        self._batch_size = max(1, min(int(batch_size), self._capacity))
+        self._flush_interval = float(flush_interval)
+        self._policy = policy
+
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._closed = False
+
+        self.written = 0
+        self.batches = 0
+        self.dropped_oldest = 0
+        self.dropped_new = 0
+        self.write_errors = 0
+
+        self._thread = threading.Thread(target=self._run, name="log-batch-writer", daemon=True)
+        self._thread.start()
+
+    @property
+    def stats(self) -> dict:
+        """Counters describing the sink's throughput and losses"""
+        return {
+            "buffered": len(self._buffer),
+            "written": self.written,
+            "batches": self.batches,
+            "dropped_oldest": self.dropped_oldest,
+            "dropped_new": self.dropped_new,
+            "write_errors": self.write_errors,
+        }
+
+    def write(self, message):
+        with self._lock:
+            if self._closed:
+                return
+            if len(self._buffer) >= self._capacity:
+                if self._policy == "drop_new":
+                    self.dropped_new += 1
+                    return
+                if self._policy == "drop_oldest":
+                    self._buffer.popleft()
+                    self.dropped_oldest += 1
+                else:
+                    while len(self._buffer) >= self._capacity and not self._closed:
+                        self._not_full.wait()
+                    if self._closed:
+                        return
+            self._buffer.append(message)
+            if len(self._buffer) >= self._batch_size:
+                self._not_empty.notify()
+
+    def _take_batch(self):
+        batch = list(self._buffer)
+        self._buffer.clear()
+        self._not_full.notify_all()
+        return batch
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._closed and len(self._buffer) < self._batch_size:
+                    self._not_empty.wait(self._flush_interval)
+                batch = self._take_batch()
+                closed = self._closed
+            if batch:
+                self._write(batch)
+            if closed:
+                return
+
+    def _write(self, batch):
+        try:
+            self._target.write_batch([str(m).encode("utf-8", "backslashreplace") for m in batch])
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as e:
+            self.write_errors += 1
+            sys.stderr.write(f"--- Batched log sink failed to write {len(batch)} messages: {e} ---\n")
+
+    def stop(self):
+        """Flush pending messages and stop the writer thread (called by loguru on remove)"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._not_empty.notify()
+            self._not_full.notify_all()
+        self._thread.join()
+        self._target.close()
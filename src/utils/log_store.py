@@ -0,0 +1,304 @@
+import glob
+import json
+import mmap
+import os
+import struct
+import time
+import zlib
+from datetime import datetime
+
+import click
+
+from .log_sink import RotatingFile, parse_duration
+
+INDEX_SUFFIX = ".idx"
+INDEX_MAGIC = b"PLIDX001"
+# ts_min, ts_max, offset, length, count, level_mask, module_mask
+INDEX_ENTRY = struct.Struct("<ddQIIIQ")
+
+LEVEL_NUMBERS = {"TRACE": 5, "DEBUG": 10, "INFO": 20, "SUCCESS": 25, "WARNING": 30, "ERROR": 40, "CRITICAL": 50}
+
+
+def parse_level(level) -> int:
+    """Level number of a level name (any case) or number, e.g. "warning", "30" or 30"""
+    if isinstance(level, int):
+        return level
+    text = str(level).strip()
+    if text.isdigit():
+        return int(text)
+    try:
+        return LEVEL_NUMBERS[text.upper()]
+    except KeyError:
+        raise ValueError(f"Unknown level {level!r}, expected a number or one of {', '.join(LEVEL_NUMBERS)}") from None
+
+
+def _level_bit(levelno: int) -> int:
+    return 1 << min(levelno // 5, 31)
+
+
+def _levels_at_least(levelno: int) -> int:
+    """Bit mask of every level bucket at or above levelno"""
+    return ~(_level_bit(levelno) - 1) & 0xFFFFFFFF
+
+
+def _module_bits(module: str) -> int:
+    """64-bit Bloom mask of a module and all of its dotted parents"""
+    bits = 0
+    parts = (module or "").split(".")
+    for i in range(1, len(parts) + 1):
+        bits |= 1 << (zlib.crc32(".".join(parts[:i]).encode()) & 63)
+    return bits
+
+
+def _module_matches(name: str, module: str) -> bool:
+    return name == module or name.startswith(module + ".")
+
+
+class StructuredLogSink:
+    """Loguru sink writing JSON-lines records plus a sparse sidecar index.
+
+    Every ``block_records`` records an index entry is appended to ``<path>.idx`` holding
+    the block's byte range, time span, a bit mask of the levels it contains and a Bloom
+    mask of its modules, so ``LogStore`` can skip blocks without reading them. The tail
+    after the last full block is not indexed yet and is scanned linearly on query.
+    """
+
+    def __init__(self, path, rotation=None, retention=None, block_records=256):
+        self._block_records = max(1, int(block_records))
+        self._file = RotatingFile(path, rotation=rotation, retention=retention, on_rotate=self._on_rotate, sidecars=(INDEX_SUFFIX,))
+        self.path = self._file.path
+        self._index_fd = None
+        self._open_index()
+        self._reset_block()
+
+    def _open_index(self):
+        index_path = self.path + INDEX_SUFFIX
+        self._index_fd = os.open(index_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        if os.fstat(self._index_fd).st_size == 0:
+            os.write(self._index_fd, INDEX_MAGIC)
+
+    def _reset_block(self):
+        # 进程重启后接着写：上次未进入索引的尾部数据会在查询时线性扫描
+        self._block_start = self._file.size
+        self._block_count = 0
+        self._block_ts_min = float("inf")
+        self._block_ts_max = float("-inf")
+        self._block_levels = 0
+        self._block_modules = 0
+
+    def _flush_block(self):
+        if not self._block_count:
+            return
+        entry = INDEX_ENTRY.pack(
+            self._block_ts_min,
+            self._block_ts_max,
+            self._block_start,
+            self._file.size - self._block_start,
+            self._block_count,
+            self._block_levels,
+            self._block_modules,
+        )
+        os.write(self._index_fd, entry)
+        self._reset_block()
+
+    def _on_rotate(self, rotated_path):
+        # 数据文件已被改名，但 size 仍是旧文件的大小，先把最后一个块写进旧索引
+        self._flush_block()
+        os.close(self._index_fd)
+        os.replace(self.path + INDEX_SUFFIX, rotated_path + INDEX_SUFFIX)
+        self._index_fd = None
+
+    def write(self, message):
+        record = message.record
+        timestamp = record["time"].timestamp()
+        levelno = record["level"].no
+        name = record["name"] or ""
+        payload = {
+            "t": timestamp,
+            "lv": record["level"].name,
+            "no": levelno,
+            "m": name,
+            "f": record["function"],
+            "ln": record["line"],
+            "p": record["process"].id,
+            "msg": record["message"],
+        }
+        if record["extra"]:
+            payload["x"] = record["extra"]
+        if record["exception"] is not None:
+            payload["exc"] = repr(record["exception"].value)
+        line = json.dumps(payload, ensure_ascii=False, default=str, separators=(",", ":")).encode("utf-8") + b"\n"
+
+        self._file.write_batch([line])
+        if self._index_fd is None:
+            # 刚刚发生了轮转，这条记录已写入新文件的开头
+            self._open_index()
+            self._block_start = 0
+
+        self._block_count += 1
+        self._block_ts_min = min(self._block_ts_min, timestamp)
+        self._block_ts_max = max(self._block_ts_max, timestamp)
+        self._block_levels |= _level_bit(levelno)
+        self._block_modules |= _module_bits(name)
+        if self._block_count >= self._block_records:
+            self._flush_block()
+
+    def stop(self):
+        """Index the pending block and close the files (called by loguru on remove)"""
+        if self._index_fd is not None:
+            self._flush_block()
+            os.close(self._index_fd)
+            self._index_fd = None
+        self._file.close()
+
+
+class LogStore:
+    """Query API over the files written by ``StructuredLogSink``"""
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+
+    def files(self):
+        """Rotated files oldest first, followed by the active file"""
+        stem, ext = os.path.splitext(self.path)
+        rotated = sorted(glob.glob(f"{glob.escape(stem)}.*{ext}"))
+        return [*rotated, self.path] if os.path.exists(self.path) else rotated
+
+    def query(self, start=None, end=None, min_level=None, module=None, limit=None, fields=None):  # noqa: PLR0913, PLR0917
+        """Yield records with start <= time <= end, level >= min_level and within module.
+
+        ``start``/``end`` are epoch seconds, ``min_level`` a level name or number and
+        ``module`` a dotted module prefix. ``fields`` maps ``extra`` keys such as
+        ``request_id`` to the values they must have, compared as strings. Records are
+        yielded in file order.
+        """
+        if min_level is not None:
+            min_level = parse_level(min_level)
+        criteria = (
+            float("-inf") if start is None else start,
+            float("inf") if end is None else end,
+            _levels_at_least(min_level) if min_level else 0xFFFFFFFF,
+            _module_bits(module) if module else 0,
+        )
+
+        yielded = 0
+        for path in self.files():
+            for record in self._query_file(path, criteria):
+                if min_level and record["no"] < min_level:
+                    continue
+                if module and not _module_matches(record["m"], module):
+                    continue
+                if fields and not _fields_match(record.get("x", {}), fields):
+                    continue
+                yield record
+                yielded += 1
+                if limit is not None and yielded >= limit:
+                    return
+
+    def _query_file(self, path, criteria):
+        start, end, level_mask, module_mask = criteria
+        try:
+            with open(path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if size == 0:
+                    return
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    covered = 0
+                    for ts_min, ts_max, offset, length, _, levels, modules in self._read_index(path + INDEX_SUFFIX):
+                        if offset > covered:
+                            # 上次进程异常退出时未进入索引的数据
+                            yield from self._scan(data, covered, offset, start, end)
+                        covered = offset + length
+                        if ts_max < start or ts_min > end:
+                            continue
+                        if not levels & level_mask or modules & module_mask != module_mask:
+                            continue
+                        yield from self._scan(data, offset, covered, start, end)
+                    # 尚未建立索引的尾部
+                    yield from self._scan(data, covered, size, start, end)
+        except FileNotFoundError:
+            # 查询期间文件被轮转或被保留策略删除
+            return
+
+    @staticmethod
+    def _read_index(index_path):
+        try:
+            with open(index_path, "rb") as f:
+                raw = f.read()
+        except FileNotFoundError:
+            return []
+        if not raw.startswith(INDEX_MAGIC):
+            return []
+        body = raw[len(INDEX_MAGIC) :]
+        # 只使用完整写入的条目
+        usable = len(body) - len(body) % INDEX_ENTRY.size
+        return INDEX_ENTRY.iter_unpack(body[:usable])
+
+    @staticmethod
+    def _scan(data, begin, stop, start, end):
+        for line in data[begin:stop].splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 写入中途的半行
+                continue
+            if start <= record["t"] <= end:
+                yield record
+
+
+def _fields_match(extra, fields):
+    return all(key in extra and str(extra[key]) == str(value) for key, value in fields.items())
+
+
+def _parse_field(ctx, param, values):
+    fields = {}
+    for value in values:
+        key, sep, expected = value.partition("=")
+        if not sep or not key:
+            raise click.BadParameter(f"expected KEY=VALUE, got {value!r}", ctx, param)
+        fields[key] = expected
+    return fields
+
+
+def _parse_level_option(ctx, param, value):
+    if value is None:
+        return None
+    try:
+        return parse_level(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e), ctx, param) from None
+
+
+def _parse_time(value):
+    """Accept an ISO timestamp or a duration ago such as "15 minutes" """
+    if value is None:
+        return None
+    seconds = parse_duration(value)
+    if seconds is not None:
+        return time.time() - seconds
+    return datetime.fromisoformat(value).timestamp()
+
+
+def _format_record(record):
+    stamp = datetime.fromtimestamp(record["t"]).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+    return f"{record['lv']: <8} {stamp} - [{record['p']}] - {record['m']}:{record['f']} - {record['msg']}"
+
+
+@click.command("query")
+@click.argument("path", type=click.Path(dir_okay=False))
+@click.option("--since", help='Start of the window: ISO time or a duration ago, e.g. "15 minutes"')
+@click.option("--until", help="End of the window: ISO time or a duration ago")
+@click.option("--level", callback=_parse_level_option, help="Minimum level: a name such as WARNING (any case) or a number")
+@click.option("--module", help="Dotted module prefix, e.g. src.utils.dask")
+@click.option("--field", "fields", multiple=True, callback=_parse_field, help="Match a bound field, e.g. request_id=3f2a9c; repeatable")
+@click.option("--limit", type=int, help="Stop after this many records")
+@click.option("--json", "as_json", is_flag=True, help="Print raw JSON records")
+def query_command(path, since, until, level, module, fields, limit, as_json):  # noqa: PLR0913, PLR0917
+    """Query a structured log file (and its rotated siblings) by time, level, module and bound fields."""
+    store = LogStore(path)
+    for record in store.query(start=_parse_time(since), end=_parse_time(until), min_level=level, module=module, limit=limit, fields=fields):
+        click.echo(json.dumps(record, ensure_ascii=False) if as_json else _format_record(record))
+
+
+if __name__ == "__main__":
+    query_command()
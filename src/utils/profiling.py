@@ -0,0 +1,190 @@
+import collections
+import contextlib
+import os
+import sys
+import threading
+import time
+
+PROFILERS = ("cprofile", "sampling")
+
+_NULL_SPAN = contextlib.nullcontext()
+
+
+class Timings:
+    """Wall-clock spans of the phases of one run, in the order they finished"""
+
+    __slots__ = ("origin", "spans")
+
+    # 当前运行的阶段计时；为 None 时 span() 直接返回共享的空上下文，不产生任何开销
+    current = None
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.spans = []
+
+    @contextlib.contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans.append((name, start - self.origin, time.perf_counter() - start))
+
+    def to_dict(self) -> dict:
+        return {
+            "total": time.perf_counter() - self.origin,
+            "spans": [{"name": name, "start": start, "seconds": seconds} for name, start, seconds in self.spans],
+        }
+
+
+def span(name):
+    """Time a phase of the run when ``--timings`` is on; a shared no-op context otherwise"""
+    timings = Timings.current
+    if timings is None:
+        return _NULL_SPAN
+    return timings.span(name)
+
+
+@contextlib.contextmanager
+def timed_run(path=None):
+    """Collect ``span()`` timings for the block, then log them and write a JSON summary to ``path``"""
+    Timings.current = timings = Timings()
+    try:
+        yield timings
+    finally:
+        Timings.current = None
+        summary = timings.to_dict()
+        for item in summary["spans"]:
+            _report(f"Timing {item['name']}: {item['seconds'] * 1000:.1f} ms (started at +{item['start'] * 1000:.1f} ms)")
+        _report(f"Timing total: {summary['total'] * 1000:.1f} ms")
+        if path:
+            _write_json(path, summary)
+
+
+def _report(message):
+    # loguru 只在真正输出报告时导入，未开启任何开关时导入本模块几乎没有代价
+    from loguru import logger  # noqa: PLC0415
+
+    logger.info(message)
+
+
+def _write_json(path, data):
+    import json  # noqa: PLC0415
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}:{code.co_qualname}"
+
+
+class SamplingProfiler:
+    """Statistical profiler: a daemon thread records every thread's stack each ``interval`` seconds.
+
+    The overhead is one stack walk per thread per sample regardless of how many calls
+    the program makes. ``write`` produces folded stacks (``thread;outer;...;inner
+    count`` per line), the input format of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = 0
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        own = threading.get_ident()
+        for ident, top_frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack, frame = [], top_frame
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def write(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top(self, limit=20):
+        """``(function, samples)`` of the innermost frames seen most often, i.e. where the time went"""
+        leaves = collections.Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return leaves.most_common(limit)
+
+
+@contextlib.contextmanager
+def profiled(path, kind="cprofile", interval=0.005, top=20):
+    """Profile the block with cProfile (a pstats file) or ``SamplingProfiler`` (folded stacks) into ``path``"""
+    if kind not in PROFILERS:
+        raise ValueError(f"Unknown profiler {kind!r}, expected one of {PROFILERS}")
+    if kind == "sampling":
+        profiler = SamplingProfiler(interval)
+        profiler.start()
+        try:
+            yield profiler
+        finally:
+            profiler.stop()
+            profiler.write(path)
+            lines = "\n".join(f"{count:>8} {name}" for name, count in profiler.top(top))
+            _report(f"Sampling profile ({profiler.samples} samples) written to {path}, most frequent frames:\n{lines}")
+        return
+
+    import cProfile  # noqa: PLC0415
+    import io  # noqa: PLC0415
+    import pstats  # noqa: PLC0415
+
+    # cProfile 只记录主线程，事件循环和应用代码都在这里
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        profiler.dump_stats(path)
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(top)
+        _report(f"cProfile stats written to {path}, top {top} by cumulative time:\n{report.getvalue()}")
+
+
+@contextlib.contextmanager
+def traced_allocations(top=20, frames=1):
+    """Trace allocations made in the block and log the ``top`` allocation sites still alive at its end"""
+    import tracemalloc  # noqa: PLC0415
+
+    tracemalloc.start(frames)
+    try:
+        yield
+    finally:
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        # 过滤掉 tracemalloc 自身和导入机制的分配
+        snapshot = snapshot.filter_traces((tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")))
+        stats = snapshot.statistics("traceback" if frames > 1 else "lineno")
+        lines = "\n".join(f"{stat.size / 2**10:>10.1f} KiB {stat.count:>8} blocks  {stat.traceback.format(limit=frames)[0].strip()}" for stat in stats[:top])
+        _report(f"Traced memory: {current / 2**20:.1f} MiB at exit, {peak / 2**20:.1f} MiB peak; top {top} allocation sites:\n{lines}")